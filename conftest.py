@@ -0,0 +1,11 @@
+"""
+pytest 全局配置
+整个测试会话只初始化一次Django
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'r_assistant.settings')
+django.setup()
@@ -4,20 +4,28 @@
 
 import json
 import logging
+import time
 from django.http import JsonResponse, HttpRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.views import View
 from django.utils.decorators import method_decorator
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, Q
 from django.utils import timezone
 
-from services.langgraph_service import langgraph_service
+from services.langgraph_service import get_langgraph_service
 from services.ai_service import AIServiceError
 from services.code_analyzer import code_analyzer
-from .models import ConversationHistory, RequestLog, CodeAnalysis
+from services.session_store import session_store
+from .models import RequestLog, CodeAnalysis, CodeSolution, UploadedFile
+from .responses import FastJsonResponse, NdjsonStreamingResponse
 
 logger = logging.getLogger(__name__)
 
+# 历史记录增量加载每页条数
+HISTORY_PAGE_SIZE = 40
+
 
 class BaseAPIView(View):
     """API视图基类"""
@@ -62,7 +70,7 @@ class BaseAPIView(View):
 class TalkAPIView(BaseAPIView):
     """智能对话API"""
     
-    @require_http_methods(["POST"])
+    @method_decorator(require_http_methods(["POST"]))
     def post(self, request: HttpRequest) -> JsonResponse:
         """处理智能对话请求"""
         try:
@@ -77,33 +85,15 @@ class TalkAPIView(BaseAPIView):
             
             session_id = self._get_session_id(request)
             
-            # 获取对话历史
-            conversation_history = list(
-                ConversationHistory.objects.filter(
-                    session_id=session_id
-                ).order_by('timestamp').values('role', 'content')[-10:]  # 最近10条
-            )
-            
             # 创建请求日志
             request_log = self._create_request_log(request, 'talk', message)
             
+            if self._wants_stream(request):
+                return NdjsonStreamingResponse(self._stream_chat(message, session_id, request_log))
+            
             try:
-                # 调用LangGraph服务
-                result = langgraph_service.chat(message, conversation_history, session_id)
-                
-                # 保存用户消息
-                ConversationHistory.objects.create(
-                    session_id=session_id,
-                    role='user',
-                    content=message
-                )
-                
-                # 保存AI回复
-                ConversationHistory.objects.create(
-                    session_id=session_id,
-                    role='assistant',
-                    content=result['content']
-                )
+                # 调用LangGraph服务（对话历史由服务端会话存储加载并写回）
+                result = get_langgraph_service().chat(message, session_id=session_id)
                 
                 # 更新请求日志
                 self._update_request_log(
@@ -114,7 +104,7 @@ class TalkAPIView(BaseAPIView):
                 
                 logger.info("Chat completed for session %s", session_id)
                 
-                return JsonResponse({
+                return FastJsonResponse({
                     'success': True,
                     'response': result['content'],
                     'processing_time': result['processing_time']
@@ -148,13 +138,46 @@ class TalkAPIView(BaseAPIView):
                 'success': False,
                 'error': '服务器内部错误'
             }, status=500)
+    
+    @staticmethod
+    def _wants_stream(request: HttpRequest) -> bool:
+        """客户端是否请求NDJSON流式响应（SSE客户端请使用 /api/streaming/talk/）"""
+        return 'application/x-ndjson' in request.headers.get('Accept', '')
+    
+    def _stream_chat(self, message: str, session_id: str, request_log):
+        """逐片输出LLM生成的文本：每行 {"delta": 片段}，最后一行为 {"done": true, ...}"""
+        start_time = time.perf_counter()
+        try:
+            for event in get_langgraph_service().stream_chat(message, session_id=session_id):
+                if event['type'] == 'token':
+                    yield {'delta': event['content']}
+                    continue
+                
+                response = event['response']
+                processing_time = time.perf_counter() - start_time
+                self._update_request_log(request_log, response['content'], processing_time,
+                                         success=response['success'])
+                yield {
+                    'done': True,
+                    'success': response['success'],
+                    'response': response['content'],
+                    'processing_time': processing_time
+                }
+        except Exception as e:
+            logger.error("Streaming chat failed for session %s: %s", session_id, str(e))
+            self._update_request_log(request_log, '', 0, success=False, error_message=str(e))
+            yield {
+                'done': True,
+                'success': False,
+                'error': '抱歉，AI服务暂时不可用，请稍后重试'
+            }
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class AnalyzeAPIView(BaseAPIView):
     """代码分析API"""
     
-    @require_http_methods(["POST"])
+    @method_decorator(require_http_methods(["POST"]))
     def post(self, request: HttpRequest) -> JsonResponse:
         """处理代码分析请求"""
         try:
@@ -178,7 +201,7 @@ class AnalyzeAPIView(BaseAPIView):
                     analysis_result = code_analyzer.analyze(code)
                     
                     # AI代码质量分析
-                    ai_result = langgraph_service.analyze_code_quality(code, session_id)
+                    ai_result = get_langgraph_service().analyze_code_quality(code, session_id)
                     
                     # 合并结果
                     combined_result = {
@@ -198,7 +221,7 @@ class AnalyzeAPIView(BaseAPIView):
                     
                 elif analysis_type == 'test':
                     # 测试用例生成
-                    ai_result = langgraph_service.generate_tests(code, session_id)
+                    ai_result = get_langgraph_service().generate_tests(code, session_id)
                     combined_result = {
                         'test_cases': ai_result['content'],
                         'processing_time': ai_result['processing_time']
@@ -213,7 +236,7 @@ class AnalyzeAPIView(BaseAPIView):
                     
                 elif analysis_type == 'optimization':
                     # 代码优化建议
-                    ai_result = langgraph_service.optimize_code(code, session_id)
+                    ai_result = get_langgraph_service().optimize_code(code, session_id)
                     combined_result = {
                         'optimization_suggestions': ai_result['content'],
                         'processing_time': ai_result['processing_time']
@@ -241,11 +264,11 @@ class AnalyzeAPIView(BaseAPIView):
                 
                 logger.info("Code analysis (%s) completed for session %s", analysis_type, request_log.session_id)
                 
-                return JsonResponse({
+                return FastJsonResponse({
                     'success': True,
                     'analysis_type': analysis_type,
                     'result': combined_result
-                })
+                }, exclude_none=True)
                 
             except AIServiceError as e:
                 self._update_request_log(
@@ -276,34 +299,50 @@ class AnalyzeAPIView(BaseAPIView):
             }, status=500)
 
 
-@method_decorator(csrf_exempt, name='dispatch')
-class ClearHistoryAPIView(BaseAPIView):
-    """清除对话历史API"""
+class HistoryMoreAPIView(BaseAPIView):
+    """历史记录增量加载API
     
-    @require_http_methods(["POST"])
-    def post(self, request: HttpRequest) -> JsonResponse:
-        """清除当前会话的对话历史"""
-        try:
-            session_id = self._get_session_id(request)
-            
-            # 删除对话历史
-            deleted_count = ConversationHistory.objects.filter(
-                session_id=session_id
-            ).delete()[0]
-            
-            logger.info("Cleared %d conversation records for session %s", deleted_count, session_id)
-            
-            return JsonResponse({
-                'success': True,
-                'message': f'已清除 {deleted_count} 条对话记录'
-            })
-            
-        except Exception as e:
-            logger.error("Error clearing conversation history: %s", str(e))
-            return JsonResponse({
-                'success': False,
-                'error': '清除历史记录失败'
-            }, status=500)
+    GET /api/history/more/?cursor=<上一页最后一条记录的id>&request_type=<可选>
+    按创建时间倒序返回游标之后的 HISTORY_PAGE_SIZE 条记录，next_cursor 为空表示没有更多记录。
+    """
+    
+    def get(self, request):
+        """获取下一页历史记录"""
+        session_id = self._get_session_id(request)
+        queryset = RequestLog.objects.filter(session_id=session_id)
+        
+        request_type = request.GET.get('request_type')
+        if request_type:
+            queryset = queryset.filter(request_type=request_type)
+        
+        cursor = request.GET.get('cursor')
+        if cursor:
+            try:
+                anchor = queryset.values('created_at', 'id').get(id=cursor)
+            except (RequestLog.DoesNotExist, ValidationError):
+                return JsonResponse({
+                    'success': False,
+                    'error': '无效的游标'
+                }, status=400)
+            # 创建时间相同的记录按id排序，保证翻页不重复、不遗漏
+            queryset = queryset.filter(
+                Q(created_at__lt=anchor['created_at']) |
+                Q(created_at=anchor['created_at'], id__lt=anchor['id'])
+            )
+        
+        # 多取一条用于判断是否还有下一页
+        rows = list(queryset.order_by('-created_at', '-id').values(
+            'id', 'request_type', 'success', 'processing_time', 'error_message',
+            'created_at', 'input_content', 'response_content'
+        )[:HISTORY_PAGE_SIZE + 1])
+        has_more = len(rows) > HISTORY_PAGE_SIZE
+        rows = rows[:HISTORY_PAGE_SIZE]
+        
+        return FastJsonResponse({
+            'success': True,
+            'history': rows,
+            'next_cursor': str(rows[-1]['id']) if has_more else None
+        })
 
 
 class HealthCheckAPIView(BaseAPIView):
@@ -320,7 +359,7 @@ class HealthCheckAPIView(BaseAPIView):
             # 检查AI服务
             ai_status = 'available'
             try:
-                test_result = langgraph_service.chat("test", [], "health_check_session")
+                test_result = get_langgraph_service().chat("test", [], "health_check_session")
                 if not test_result.get('content'):
                     ai_status = 'degraded'
             except Exception:
@@ -375,9 +414,9 @@ class ExplainAPIView(BaseAPIView):
                 if analysis_mode == 'selected' and full_code:
                     # 为选中代码提供完整上下文
                     context_info = f"完整代码上下文：\n{full_code}\n\n需要解释的选中部分（第{min(selected_lines)}-{max(selected_lines)}行）：\n{code}"
-                    result = langgraph_service.explain_code(context_info, session_id, mode='selected')
+                    result = get_langgraph_service().explain_code(context_info, session_id, mode='selected')
                 else:
-                    result = langgraph_service.explain_code(code, session_id, mode=analysis_mode)
+                    result = get_langgraph_service().explain_code(code, session_id, mode=analysis_mode)
                 
                 # 更新请求日志
                 self._update_request_log(
@@ -388,13 +427,16 @@ class ExplainAPIView(BaseAPIView):
                     result.get('error', '')
                 )
                 
-                return JsonResponse({
+                # 解释完成后用户通常会接着提问，提前加载会话历史
+                get_langgraph_service().prewarm_chat(session_id)
+                
+                return FastJsonResponse({
                     'success': True,
                     'explanation': result.get('content', ''),
                     'processing_time': result.get('processing_time', 0),
                     'metadata': result.get('metadata', {}),
                     'analysis_mode': analysis_mode
-                })
+                }, exclude_none=True)
                 
             except AIServiceError as e:
                 logger.error("代码解释失败: %s", str(e))
@@ -439,7 +481,7 @@ class AnswerAPIView(BaseAPIView):
             
             try:
                 # 使用LangGraph服务解决问题
-                result = langgraph_service.solve_problem(problem, session_id)
+                result = get_langgraph_service().solve_problem(problem, session_id)
                 
                 # 更新请求日志
                 self._update_request_log(
@@ -450,12 +492,12 @@ class AnswerAPIView(BaseAPIView):
                     result.get('error', '')
                 )
                 
-                return JsonResponse({
+                return FastJsonResponse({
                     'success': True,
                     'solutions': result.get('solutions', []),
                     'processing_time': result.get('processing_time', 0),
                     'metadata': result.get('metadata', {})
-                })
+                }, exclude_none=True)
                 
             except AIServiceError as e:
                 logger.error("问题解答失败: %s", str(e))
@@ -558,9 +600,17 @@ class AnswerHistoryAPIView(BaseAPIView):
             session_id = self._get_session_id(request)
             
             # 获取作业求解类型的历史记录
+            # 解决方案和上传文件一次性预取，避免每条记录单独查询
             history_records = RequestLog.objects.filter(
                 session_id=session_id,
                 request_type='answer'
+            ).prefetch_related(
+                Prefetch('solutions', queryset=CodeSolution.objects.only(
+                    'request_log', 'solution_number', 'title', 'code', 'explanation', 'filename'
+                )),
+                Prefetch('uploaded_files', queryset=UploadedFile.objects.only(
+                    'request_log', 'original_filename', 'file_type', 'file_size', 'created_at'
+                ))
             ).order_by('-created_at')[:20]  # 最近20条
             
             history_data = []
@@ -577,7 +627,7 @@ class AnswerHistoryAPIView(BaseAPIView):
                 
                 # 获取上传文件
                 uploaded_files = []
-                for file in record.uploadedfile_set.all():
+                for file in record.uploaded_files.all():
                     uploaded_files.append({
                         'filename': file.original_filename,
                         'file_type': file.file_type,
@@ -634,7 +684,7 @@ class AnswerHistoryDetailAPIView(BaseAPIView):
             
             # 获取上传文件
             uploaded_files = []
-            for file in record.uploadedfile_set.all():
+            for file in record.uploaded_files.all():
                 uploaded_files.append({
                     'filename': file.original_filename,
                     'file_type': file.file_type,
@@ -706,6 +756,7 @@ class AnswerHistoryDetailAPIView(BaseAPIView):
 class ClearHistoryAPIView(BaseAPIView):
     """清空历史记录API"""
     
+    @method_decorator(require_http_methods(["POST"]))
     def post(self, request):
         """清空历史记录"""
         try:
@@ -731,6 +782,11 @@ class ClearHistoryAPIView(BaseAPIView):
                     'error': '无效的清空类型'
                 }, status=400)
             
+            # 同时清空对话历史和会话摘要，避免旧对话在下一轮重新进入提示词
+            conversation_count = session_store.clear(session_id)
+            logger.info("Cleared %d records and %d conversation messages for session %s",
+                        deleted_count, conversation_count, session_id)
+            
             return JsonResponse({
                 'success': True,
                 'message': f'已清空 {deleted_count} 条记录'
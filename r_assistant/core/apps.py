@@ -6,4 +6,7 @@ class CoreConfig(AppConfig):
     """Configuration for the core app."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    verbose_name = 'R语言助手核心'
\ No newline at end of file
+    verbose_name = 'R语言助手核心'
+
+    def ready(self):
+        from . import signals  # noqa: F401  注册信号处理函数
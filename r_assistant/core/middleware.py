@@ -0,0 +1,18 @@
+"""
+自定义中间件
+"""
+
+from django.middleware.gzip import GZipMiddleware
+
+
+class NonStreamingGZipMiddleware(GZipMiddleware):
+    """只压缩普通响应的GZip中间件
+
+    Django 的 compress_sequence 不会在每个分片后刷新gzip缓冲区，
+    流式响应（SSE/NDJSON）会被整体积压到结束才发出，因此跳过流式响应。
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-16 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_uploadedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationhistory',
+            name='tokens',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-16 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_conversationhistory_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['session_id', '-created_at'], name='request_log_session_b12e44_idx'),
+        ),
+    ]
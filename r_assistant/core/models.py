@@ -31,6 +31,9 @@ class RequestLog(models.Model):
     class Meta:
         db_table = 'request_logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['session_id', '-created_at']),
+        ]
         
     def __str__(self):
         return f"{self.get_request_type_display()} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
@@ -67,6 +70,7 @@ class ConversationHistory(models.Model):
     session_id = models.CharField(max_length=255)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     content = models.TextField()
+    tokens = models.IntegerField(default=0)  # 生成该消息消耗的token数
     timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
@@ -182,4 +186,9 @@ class CodeAnalysis(models.Model):
         ordering = ['-created_at']
         
     def __str__(self):
-        return f"{self.get_analysis_type_display()} - {self.score or 'N/A'}"
\ No newline at end of file
+        return f"{self.get_analysis_type_display()} - {self.score or 'N/A'}"
+
+
+# 模型字段名，导入时计算一次，避免各处重复遍历 _meta.fields
+REQUEST_LOG_FIELDS = tuple(field.name for field in RequestLog._meta.fields)
+CODE_SOLUTION_FIELDS = tuple(field.name for field in CodeSolution._meta.fields)
@@ -0,0 +1,56 @@
+"""
+快速JSON响应
+优先使用orjson（C实现）序列化响应数据，未安装时回退到Django自带的JSON编码器
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def dumps(data) -> bytes:
+    """把数据序列化为UTF-8编码的JSON"""
+    if orjson is not None:
+        # orjson原生支持datetime/UUID等类型，其余类型交给Django编码器处理
+        return orjson.dumps(data, default=_django_encoder.default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+
+
+def drop_none(data):
+    """递归去掉字典中值为None的键（列表中的字典同样处理）"""
+    if isinstance(data, dict):
+        return {key: drop_none(value) for key, value in data.items() if value is not None}
+    if isinstance(data, (list, tuple)):
+        return [drop_none(item) for item in data]
+    return data
+
+
+class FastJsonResponse(HttpResponse):
+    """与JsonResponse用法相同的JSON响应，data必须是可序列化的字典
+
+    exclude_none=True 时省略值为None的字段，减小响应体积。
+    """
+
+    def __init__(self, data, exclude_none: bool = False, **kwargs):
+        if exclude_none:
+            data = drop_none(data)
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class NdjsonStreamingResponse(StreamingHttpResponse):
+    """逐行输出JSON对象的流式响应（NDJSON），events中的每个字典序列化为一行"""
+
+    def __init__(self, events, **kwargs):
+        kwargs.setdefault('content_type', 'application/x-ndjson')
+        super().__init__((dumps(event) + b'\n' for event in events), **kwargs)
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'  # 禁用nginx缓冲
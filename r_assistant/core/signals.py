@@ -0,0 +1,30 @@
+"""
+模型信号处理
+请求记录或解决方案写入后使该会话的首页统计缓存失效
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CodeSolution, RequestLog
+
+
+def index_stats_cache_key(session_id: str) -> str:
+    """首页统计信息的缓存键"""
+    return f"index_stats:{session_id}"
+
+
+@receiver(post_save, sender=RequestLog)
+@receiver(post_delete, sender=RequestLog)
+def invalidate_request_log_stats(sender, instance, **kwargs):
+    if instance.session_id:
+        cache.delete(index_stats_cache_key(instance.session_id))
+
+
+@receiver(post_save, sender=CodeSolution)
+def invalidate_solution_stats(sender, instance, **kwargs):
+    # 解决方案只会随请求记录一起删除，删除时的失效由上面的处理函数负责
+    session_id = instance.request_log.session_id
+    if session_id:
+        cache.delete(index_stats_cache_key(session_id))
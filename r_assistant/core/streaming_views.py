@@ -1,6 +1,5 @@
 import json
 import logging
-import asyncio
 import time
 from datetime import datetime
 from django.http import StreamingHttpResponse, JsonResponse
@@ -12,7 +11,7 @@ from django.shortcuts import get_object_or_404
 
 from .models import RequestLog, CodeSolution, UploadedFile
 from .views import get_session_id, get_client_ip
-from services.langgraph_service import langgraph_service
+from services.langgraph_service import get_langgraph_service
 from services.ai_service import AIServiceError
 
 logger = logging.getLogger(__name__)
@@ -138,18 +137,12 @@ class StreamingExplainView(View, StreamingResponseMixin):
                     # 这里应该调用异步的解释服务
                     # 由于当前服务是同步的，我们需要适配
                     def run_async_explain():
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            return loop.run_until_complete(
-                                langgraph_service.workflow_engine.execute_workflow(
-                                    request_type="explain",
-                                    user_input=code,
-                                    session_id=session_id
-                                )
-                            )
-                        finally:
-                            loop.close()
+                        # 在服务的后台事件循环中执行，不再为每个请求创建事件循环
+                        return get_langgraph_service().run_workflow(
+                            request_type="explain",
+                            user_input=code,
+                            session_id=session_id
+                        )
                     
                     yield self.format_sse_data('progress', {
                         'message': '正在生成详细解释...',
@@ -285,18 +278,12 @@ class StreamingAnswerView(View, StreamingResponseMixin):
                     start_time = time.time()
                     
                     def run_async_solve():
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            return loop.run_until_complete(
-                                langgraph_service.workflow_engine.execute_workflow(
-                                    request_type="answer",
-                                    user_input=problem,
-                                    session_id=session_id
-                                )
-                            )
-                        finally:
-                            loop.close()
+                        # 在服务的后台事件循环中执行，不再为每个请求创建事件循环
+                        return get_langgraph_service().run_workflow(
+                            request_type="answer",
+                            user_input=problem,
+                            session_id=session_id
+                        )
                     
                     yield self.format_sse_data('progress', {
                         'message': '正在优化代码解决方案...',
@@ -388,7 +375,10 @@ class StreamingAnswerView(View, StreamingResponseMixin):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class StreamingTalkView(View, StreamingResponseMixin):
-    """简化的流式智能对话视图"""
+    """流式智能对话视图
+
+    对话历史由服务端会话存储维护，LLM生成的文本片段实时推送给客户端。
+    """
     
     def post(self, request):
         try:
@@ -396,10 +386,8 @@ class StreamingTalkView(View, StreamingResponseMixin):
             if request.content_type == 'application/json':
                 data = json.loads(request.body)
                 message = data.get('message', '').strip()
-                conversation_history = data.get('history', [])
             else:
                 message = request.POST.get('message', '').strip()
-                conversation_history = []
             
             if not message:
                 return JsonResponse({'error': '请输入消息'}, status=400)
@@ -425,59 +413,35 @@ class StreamingTalkView(View, StreamingResponseMixin):
                         user_agent=request.META.get('HTTP_USER_AGENT', '')
                     )
                     
-                    # 执行对话
                     start_time = time.time()
+                    parts = []
                     
-                    def run_async_talk():
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            return loop.run_until_complete(
-                                langgraph_service.workflow_engine.execute_workflow(
-                                    request_type="talk",
-                                    user_input=message,
-                                    session_id=session_id
-                                )
-                            )
-                        finally:
-                            loop.close()
-                    
-                    # 执行对话
-                    result = run_async_talk()
-                    
-                    # 处理结果
-                    processing_time = time.time() - start_time
-                    success = result.get('status') == 'success'
-                    ai_response = result.get('ai_response', '')
-                    
-                    # 更新请求日志
-                    request_log.response_content = ai_response
-                    request_log.success = success
-                    request_log.processing_time = processing_time
-                    if not success:
-                        request_log.error_message = '; '.join(result.get('errors', []))
-                    request_log.save()
-                    
-                    # 发送回复（模拟逐字输出）
-                    if ai_response:
-                        words = ai_response.split()
-                        current_text = ""
-                        for i, word in enumerate(words):
-                            current_text += word + " "
+                    for event in get_langgraph_service().stream_chat(message, session_id=session_id):
+                        if event['type'] == 'token':
+                            # 发送目前为止生成的完整文本
+                            parts.append(event['content'])
                             yield self.format_sse_data('message_chunk', {
-                                'text': current_text.strip(),
-                                'is_complete': i == len(words) - 1
+                                'text': ''.join(parts),
+                                'is_complete': False
                             })
-                            # 稍微延迟以模拟打字效果
-                            time.sleep(0.05)
-                    
-                    # 发送最终结果
-                    yield self.format_sse_data('result', {
-                        'success': success,
-                        'response': ai_response,
-                        'processing_time': processing_time,
-                        'total_tokens': result.get('total_tokens', 0)
-                    })
+                            continue
+                        
+                        response = event['response']
+                        processing_time = time.time() - start_time
+                        
+                        # 更新请求日志
+                        request_log.response_content = response['content']
+                        request_log.success = response['success']
+                        request_log.processing_time = processing_time
+                        request_log.save()
+                        
+                        # 发送最终结果
+                        yield self.format_sse_data('result', {
+                            'success': response['success'],
+                            'response': response['content'],
+                            'processing_time': processing_time,
+                            'total_tokens': response['usage']['total_tokens']
+                        })
                     
                     # 发送完成事件
                     yield self.format_sse_data('complete', {
@@ -496,4 +460,4 @@ class StreamingTalkView(View, StreamingResponseMixin):
             
         except Exception as e:
             logger.error(f"处理流式对话请求失败: {str(e)}")
-            return JsonResponse({'error': '系统错误，请稍后重试'}, status=500)
\ No newline at end of file
+            return JsonResponse({'error': '系统错误，请稍后重试'}, status=500)
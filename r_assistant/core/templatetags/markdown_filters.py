@@ -3,11 +3,24 @@ Markdown template filters for rendering formatted text
 """
 
 import re
+from functools import lru_cache
 from django import template
 from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+# Patterns compiled once at import
+_CODE_BLOCK_RE = re.compile(r'```(.*?)```', re.DOTALL)
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+_H3_RE = re.compile(r'^### (.*$)', re.MULTILINE)
+_H2_RE = re.compile(r'^## (.*$)', re.MULTILINE)
+_H1_RE = re.compile(r'^# (.*$)', re.MULTILINE)
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_ORDERED_ITEM_RE = re.compile(r'^\d+\. ')
+_EMPTY_PARAGRAPH_RE = re.compile(r'<p>\s*</p>')
+_NEWLINES_RE = re.compile(r'\n+')
+
 
 @register.filter(name='markdown')
 def markdown_filter(value):
@@ -18,27 +31,26 @@ def markdown_filter(value):
     if not value:
         return ''
     
-    # Convert the text
-    html = str(value)
-    
+    return mark_safe(_render_markdown(str(value)))
+
+
+@lru_cache(maxsize=256)
+def _render_markdown(html):
+    """Render Markdown text to HTML; results are cached since history pages re-render the same responses"""
     # Code blocks first (```code```) - preserve content inside
-    def replace_code_block(match):
-        code_content = match.group(1)
-        return f'<pre><code>{code_content}</code></pre>'
-    
-    html = re.sub(r'```(.*?)```', replace_code_block, html, flags=re.DOTALL)
+    html = _CODE_BLOCK_RE.sub(r'<pre><code>\1</code></pre>', html)
     
     # Inline code (preserve backticks)
-    html = re.sub(r'`([^`]+)`', r'<code>\1</code>', html)
+    html = _INLINE_CODE_RE.sub(r'<code>\1</code>', html)
     
     # Headers
-    html = re.sub(r'^### (.*$)', r'<h3>\1</h3>', html, flags=re.MULTILINE)
-    html = re.sub(r'^## (.*$)', r'<h2>\1</h2>', html, flags=re.MULTILINE)
-    html = re.sub(r'^# (.*$)', r'<h1>\1</h1>', html, flags=re.MULTILINE)
+    html = _H3_RE.sub(r'<h3>\1</h3>', html)
+    html = _H2_RE.sub(r'<h2>\1</h2>', html)
+    html = _H1_RE.sub(r'<h1>\1</h1>', html)
     
     # Bold and italic
-    html = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', html)
-    html = re.sub(r'\*(.*?)\*', r'<em>\1</em>', html)
+    html = _BOLD_RE.sub(r'<strong>\1</strong>', html)
+    html = _ITALIC_RE.sub(r'<em>\1</em>', html)
     
     # Process lines for lists and paragraphs
     lines = html.split('\n')
@@ -59,7 +71,7 @@ def markdown_filter(value):
                 list_type = 'ul'
             result_lines.append(f'<li>{stripped[2:]}</li>')
             
-        elif re.match(r'^\d+\. ', stripped):
+        elif _ORDERED_ITEM_RE.match(stripped):
             if not in_list or list_type != 'ol':
                 if in_list:
                     result_lines.append(f'</{list_type}>')
@@ -67,7 +79,7 @@ def markdown_filter(value):
                 in_list = True
                 list_type = 'ol'
             # Extract content after "number. "
-            content = re.sub(r'^\d+\. ', '', stripped)
+            content = _ORDERED_ITEM_RE.sub('', stripped)
             result_lines.append(f'<li>{content}</li>')
             
         else:
@@ -94,10 +106,10 @@ def markdown_filter(value):
     html = '\n'.join(result_lines)
     
     # Clean up extra empty paragraphs
-    html = re.sub(r'<p>\s*</p>', '', html)
-    html = re.sub(r'\n+', '\n', html)
+    html = _EMPTY_PARAGRAPH_RE.sub('', html)
+    html = _NEWLINES_RE.sub('\n', html)
     
-    return mark_safe(html)
+    return html
 
 
 @register.filter(name='markdown_safe')
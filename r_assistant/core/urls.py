@@ -6,6 +6,7 @@ from django.urls import path
 from . import views
 from . import workflow_monitor
 from . import api_views
+from . import streaming_views
 
 app_name = 'core'
 
@@ -22,10 +23,12 @@ urlpatterns = [
     path('api/answer/', api_views.AnswerAPIView.as_view(), name='api_answer'),
     path('api/answer/stream/', api_views.AnswerStreamAPIView.as_view(), name='answer_stream'),
     path('api/talk/', api_views.TalkAPIView.as_view(), name='api_talk'),
+    path('api/streaming/talk/', streaming_views.StreamingTalkView.as_view(), name='api_streaming_talk'),
     
     # History API endpoints
     path('api/history/answer/', api_views.AnswerHistoryAPIView.as_view(), name='api_answer_history'),
     path('api/history/answer/<uuid:record_id>/', api_views.AnswerHistoryDetailAPIView.as_view(), name='api_answer_history_detail'),
+    path('api/history/more/', api_views.HistoryMoreAPIView.as_view(), name='api_history_more'),
     path('api/history/clear/', api_views.ClearHistoryAPIView.as_view(), name='api_clear_history'),
     
     # Functional operations
@@ -4,6 +4,7 @@ import time
 from datetime import datetime, timedelta
 
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http import JsonResponse
@@ -13,11 +14,16 @@ from django.views.generic import TemplateView, ListView
 from django.views import View
 
 from .models import RequestLog, CodeSolution, ConversationHistory, UserSession
-from services.langgraph_service import langgraph_service
+from .signals import index_stats_cache_key
+from services.langgraph_service import get_langgraph_service
 from services.ai_service import AIServiceError
+from services.session_store import session_store
 
 logger = logging.getLogger(__name__)
 
+# 首页统计信息的缓存时间（秒）
+INDEX_STATS_CACHE_TIMEOUT = 60
+
 
 def simple_ai_response(request_type: str, content: str):
     """Return deterministic placeholder responses for automated tests."""
@@ -91,17 +97,22 @@ class IndexView(TemplateView):
         user_session.last_accessed = timezone.now()
         user_session.save()
         
-        # 获取统计信息
-        context.update({
-            'total_requests': RequestLog.objects.filter(session_id=session_id).count(),
-            'successful_requests': RequestLog.objects.filter(
-                session_id=session_id, 
-                success=True
-            ).count(),
-            'recent_solutions': CodeSolution.objects.filter(
-                request_log__session_id=session_id
-            ).order_by('-created_at')[:3],
-        })
+        # 获取统计信息（按会话缓存，写入请求记录或解决方案时失效，见 signals.py）
+        stats_key = index_stats_cache_key(session_id)
+        stats = cache.get(stats_key)
+        if stats is None:
+            stats = {
+                'total_requests': RequestLog.objects.filter(session_id=session_id).count(),
+                'successful_requests': RequestLog.objects.filter(
+                    session_id=session_id, 
+                    success=True
+                ).count(),
+                'recent_solutions': list(CodeSolution.objects.filter(
+                    request_log__session_id=session_id
+                ).order_by('-created_at')[:3]),
+            }
+            cache.set(stats_key, stats, INDEX_STATS_CACHE_TIMEOUT)
+        context.update(stats)
         
         return context
 
@@ -119,7 +130,7 @@ class ExplainView(TemplateView):
         recent_explanations = RequestLog.objects.filter(
             session_id=session_id,
             request_type='explain'
-        ).order_by('-created_at')[:5]
+        ).only('id', 'session_id', 'request_type', 'created_at', 'success').order_by('-created_at')[:5]
         
         context['recent_explanations'] = recent_explanations
         return context
@@ -150,7 +161,7 @@ class ExplainView(TemplateView):
             
             try:
                 # 使用LangGraph服务进行代码解释
-                result = langgraph_service.explain_code(r_code, session_id)
+                result = get_langgraph_service().explain_code(r_code, session_id)
                 
                 # 计算响应时间
                 processing_time = result.get('processing_time', 0)
@@ -208,7 +219,7 @@ class AnswerView(TemplateView):
         recent_solutions = RequestLog.objects.filter(
             session_id=session_id,
             request_type='answer'
-        ).order_by('-created_at')[:5]
+        ).only('id', 'session_id', 'request_type', 'created_at', 'success').order_by('-created_at')[:5]
         
         context['recent_solutions'] = recent_solutions
         return context
@@ -289,7 +300,7 @@ class AnswerView(TemplateView):
             
             try:
                 # 使用LangGraph服务进行问题求解，包含文件内容
-                result = langgraph_service.solve_problem(problem, session_id, uploaded_files=file_contents)
+                result = get_langgraph_service().solve_problem(problem, session_id, uploaded_files=file_contents)
                 
                 # 计算响应时间
                 processing_time = result.get('processing_time', 0)
@@ -401,13 +412,6 @@ class TalkView(TemplateView):
             # 获取会话ID
             session_id = get_session_id(request)
             
-            # 记录用户消息
-            user_message = ConversationHistory.objects.create(
-                session_id=session_id,
-                role='user',
-                content=message
-            )
-            
             # 记录开始时间
             start_time = time.time()
             
@@ -421,28 +425,12 @@ class TalkView(TemplateView):
             )
             
             try:
-                # 获取对话历史
-                conversation_history = list(
-                    ConversationHistory.objects.filter(
-                        session_id=session_id
-                    ).order_by('-timestamp').values('role', 'content')[:10]  # 最近10条
-                )
-                # 反转顺序，使最早的消息在前面
-                conversation_history.reverse()
-                
-                # 使用LangGraph服务进行智能对话
-                result = langgraph_service.chat(message, conversation_history, session_id)
+                # 使用LangGraph服务进行智能对话（对话历史由服务端会话存储加载并写回）
+                result = get_langgraph_service().chat(message, session_id=session_id)
                 
                 # 计算响应时间
                 processing_time = result.get('processing_time', 0)
-                
-                # 保存AI回复
                 ai_response = result['content']
-                ConversationHistory.objects.create(
-                    session_id=session_id,
-                    role='assistant',
-                    content=ai_response
-                )
                 
                 # 更新请求日志
                 request_log.response_content = ai_response
@@ -513,7 +501,11 @@ class HistoryView(ListView):
                 Q(error_message__icontains=keyword)
             )
         
-        return queryset.order_by('-created_at')
+        # 只加载列表页用到的字段
+        return queryset.only(
+            'id', 'request_type', 'success', 'processing_time', 'error_message',
+            'created_at', 'input_content', 'response_content'
+        ).order_by('-created_at')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -543,7 +535,7 @@ def clear_history(request):
     """清除对话历史"""
     if request.method == 'POST':
         session_id = get_session_id(request)
-        ConversationHistory.objects.filter(session_id=session_id).delete()
+        session_store.clear(session_id)
         messages.success(request, '对话历史已清除')
     
     return redirect('core:talk')
\ No newline at end of file
@@ -18,7 +18,9 @@ from django.views.generic import TemplateView
 from django.utils.decorators import method_decorator
 
 from .models import RequestLog, ConversationHistory
-from services.langgraph_workflow import workflow_engine
+from services.langgraph_service import get_langgraph_service
+from services.response_cache import response_cache
+from services.semantic_cache import semantic_cache
 
 logger = logging.getLogger(__name__)
 
@@ -100,7 +102,7 @@ class WorkflowMonitorView(TemplateView):
     def _get_workflow_status(self) -> Dict[str, Any]:
         """获取工作流状态"""
         try:
-            workflows = workflow_engine.workflows
+            workflows = get_langgraph_service().workflow_engine.workflows
             status = {}
             
             for workflow_name in workflows.keys():
@@ -148,7 +150,7 @@ def workflow_api_status(request):
                     avg_time=models.Avg('processing_time')
                 )['avg_time'] or 0
             },
-            'active_workflows': list(workflow_engine.workflows.keys()),
+            'active_workflows': list(get_langgraph_service().workflow_engine.workflows.keys()),
             'memory_usage': _get_memory_usage(),
             'system_status': 'healthy'
         }
@@ -169,8 +171,8 @@ def clear_workflow_cache(request):
     """清除工作流缓存"""
     if request.method == 'POST':
         try:
-            # 这里可以添加清除缓存的逻辑
-            # 比如清除工作流内存、重置状态等
+            response_cache.clear()
+            semantic_cache.clear()
             
             logger.info("工作流缓存已清除")
             messages.success(request, "工作流缓存已成功清除")
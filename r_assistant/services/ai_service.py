@@ -4,6 +4,7 @@ AI服务接口
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import logging
@@ -13,6 +14,14 @@ from .prompt_manager import PromptManager
 
 logger = logging.getLogger(__name__)
 
+# 共享的系统消息（只读，请勿修改）
+# 系统提示词在进程生命周期内不变，构造一次后在每次请求中复用同一个dict对象
+_SYSTEM_MSG_TALK = {"role": "system", "content": PromptManager.get_system_prompt('conversation')}
+_SYSTEM_MSG_TEACHER = {"role": "system", "content": "你是一位专业的R语言教师，专门帮助学生解决编程问题。"}
+_SYSTEM_MSG_QUALITY = {"role": "system", "content": "你是一位R语言代码质量专家，专门进行代码审查和质量分析。"}
+_SYSTEM_MSG_TESTING = {"role": "system", "content": "你是一位R语言测试专家，专门编写全面的测试用例。"}
+_SYSTEM_MSG_OPTIMIZE = {"role": "system", "content": "你是一位R语言性能优化专家，专门进行代码优化和改进。"}
+
 
 class AIServiceError(Exception):
     """AI服务异常类"""
@@ -30,6 +39,10 @@ class DeepSeekService:
             'Content-Type': 'application/json',
         }
         self.default_model = 'deepseek-chat'
+        # 复用连接池，避免每次请求都重新建立TCP+TLS连接
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
         
         if not self.api_key or self.api_key == 'sk-placeholder-key-change-this':
             logger.warning("DeepSeek API key not configured properly. Please set DEEPSEEK_API_KEY in .env file.")
@@ -55,9 +68,8 @@ class DeepSeekService:
         
         try:
             start_time = time.time()
-            response = requests.post(
+            response = self.session.post(
                 self.api_url,
-                headers=self.headers,
                 json=payload,
                 timeout=60
             )
@@ -99,7 +111,7 @@ class DeepSeekService:
         """代码解释服务"""
         prompt = PromptManager.get_explain_prompt(code)
         messages = [
-            {"role": "system", "content": PromptManager.get_talk_prompt()},
+            _SYSTEM_MSG_TALK,
             {"role": "user", "content": prompt}
         ]
         
@@ -115,7 +127,7 @@ class DeepSeekService:
         """作业求解服务"""
         prompt = PromptManager.get_answer_prompt(problem)
         messages = [
-            {"role": "system", "content": "你是一位专业的R语言教师，专门帮助学生解决编程问题。"},
+            _SYSTEM_MSG_TEACHER,
             {"role": "user", "content": prompt}
         ]
         
@@ -129,7 +141,7 @@ class DeepSeekService:
     
     def chat(self, message: str, conversation_history: List[Dict[str, str]] = None) -> Dict[str, Any]:
         """智能对话服务"""
-        messages = [{"role": "system", "content": PromptManager.get_talk_prompt()}]
+        messages = [_SYSTEM_MSG_TALK]
         
         # 添加对话历史
         if conversation_history:
@@ -151,7 +163,7 @@ class DeepSeekService:
         """代码质量分析服务"""
         prompt = PromptManager.get_code_quality_prompt(code)
         messages = [
-            {"role": "system", "content": "你是一位R语言代码质量专家，专门进行代码审查和质量分析。"},
+            _SYSTEM_MSG_QUALITY,
             {"role": "user", "content": prompt}
         ]
         
@@ -167,7 +179,7 @@ class DeepSeekService:
         """测试用例生成服务"""
         prompt = PromptManager.get_test_generation_prompt(code)
         messages = [
-            {"role": "system", "content": "你是一位R语言测试专家，专门编写全面的测试用例。"},
+            _SYSTEM_MSG_TESTING,
             {"role": "user", "content": prompt}
         ]
         
@@ -183,7 +195,7 @@ class DeepSeekService:
         """代码优化服务"""
         prompt = PromptManager.get_optimization_prompt(code)
         messages = [
-            {"role": "system", "content": "你是一位R语言性能优化专家，专门进行代码优化和改进。"},
+            _SYSTEM_MSG_OPTIMIZE,
             {"role": "user", "content": prompt}
         ]
         
@@ -3,12 +3,15 @@ LangGraph代理基类和专用代理
 实现基于LangGraph的智能代理系统
 """
 
+import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import weakref
+from typing import List
 from datetime import datetime
 import uuid
 
+import httpx
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END, START
@@ -16,11 +19,54 @@ from langgraph.prebuilt import ToolExecutor
 from langgraph.checkpoint.memory import MemorySaver
 
 from django.conf import settings
-from .workflow_state import WorkflowState, Message, CodeSolution, AgentConfig
+from .workflow_state import WorkflowState, Message, CodeSolution, AgentConfig, CodeAnalysisResult, record_step
 from .advanced_prompt_manager import advanced_prompt_manager
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """按事件循环分别维护连接池的传输层
+
+    连接池中的连接绑定创建它的事件循环，后台事件循环线程和其他事件循环
+    （例如测试脚本中的 asyncio.run）各自使用独立的连接池。
+    """
+
+    def __init__(self, **transport_kwargs):
+        self._transport_kwargs = transport_kwargs
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._transport_kwargs)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+# 所有代理共享的异步HTTP客户端，同一事件循环中的LLM调用复用到 LLM API 的连接
+_shared_httpx_client = httpx.AsyncClient(
+    transport=_LoopLocalTransport(
+        http2=_HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_keepalive_connections=32)
+    ),
+    timeout=60
+)
+
 
 class BaseAgent:
     """基础代理类"""
@@ -28,6 +74,8 @@ class BaseAgent:
     def __init__(self, config: AgentConfig):
         self.config = config
         self.llm = self._create_llm()
+        # 系统提示词在代理生命周期内保持不变，只构造一次
+        self.system_message = SystemMessage(content=config.system_prompt)
         
     def _create_llm(self):
         """创建LLM实例"""
@@ -47,19 +95,27 @@ class BaseAgent:
             max_tokens=self.config.max_tokens,
             base_url=base_url,
             api_key=api_key,
-            timeout=60
+            timeout=60,
+            http_async_client=_shared_httpx_client
         )
     
     def create_messages(self, state: WorkflowState) -> List:
-        """创建消息列表"""
-        messages = [SystemMessage(content=self.config.system_prompt)]
+        """创建消息列表
         
-        # 添加对话历史
+        第一条系统消息始终是逐字节不变的静态提示词，对话摘要和历史等动态内容
+        只以独立的消息追加在其后，从而让服务端的提示词前缀缓存可以命中。
+        不要把任何动态内容拼接进第一条系统消息。
+        """
+        messages = [self.system_message]
+
+        # 添加对话历史（会话存储生成的摘要以独立系统消息的形式排在最前）
         for msg in state.get("conversation_history", []):
             if msg.role == "user":
                 messages.append(HumanMessage(content=msg.content))
             elif msg.role == "assistant":
                 messages.append(AIMessage(content=msg.content))
+            elif msg.role == "system" and msg.metadata.get("summary"):
+                messages.append(SystemMessage(content=msg.content))
         
         return messages
     
@@ -84,7 +140,7 @@ class CodeExplainerAgent(BaseAgent):
     async def process(self, state: WorkflowState) -> WorkflowState:
         """处理代码解释请求"""
         try:
-            state["processing_steps"].append(f"[{datetime.now()}] 开始代码解释")
+            record_step(state, "开始代码解释")
             
             code = state.get("user_input", "")
             if not code:
@@ -105,7 +161,7 @@ class CodeExplainerAgent(BaseAgent):
             # 更新状态
             state["explanation_result"] = response.content
             state["ai_response"] = response.content
-            state["processing_steps"].append(f"[{datetime.now()}] 代码解释完成")
+            record_step(state, "代码解释完成")
             
             return state
             
@@ -131,7 +187,7 @@ class ProblemSolverAgent(BaseAgent):
     async def process(self, state: WorkflowState) -> WorkflowState:
         """处理问题求解请求"""
         try:
-            state["processing_steps"].append(f"[{datetime.now()}] 开始问题求解")
+            record_step(state, "开始问题求解")
             
             problem = state.get("user_input", "")
             if not problem:
@@ -155,7 +211,7 @@ class ProblemSolverAgent(BaseAgent):
             # 更新状态
             state["code_solutions"] = solutions
             state["ai_response"] = response.content
-            state["processing_steps"].append(f"[{datetime.now()}] 问题求解完成，生成{len(solutions)}个解决方案")
+            record_step(state, f"问题求解完成，生成{len(solutions)}个解决方案")
             
             return state
             
@@ -167,30 +223,30 @@ class ProblemSolverAgent(BaseAgent):
     def _parse_solutions(self, response: str, problem: str) -> List[CodeSolution]:
         """解析AI回复中的解决方案"""
         solutions = [
-            CodeSolution(
+            CodeSolution.from_trusted(dict(
                 title="基础解决方案",
                 code=f'# 基于您的问题：{problem}\n\n# 方案一：基础实现\nlibrary(ggplot2)\ndata <- read.csv("data.csv")\nresult <- summary(data)\nprint(result)',
                 explanation="这是一个基础的解决方案，适用于初学者。使用了R语言的基本函数来处理数据。",
                 difficulty="basic",
-                packages=["base", "ggplot2"],
+                packages=("base", "ggplot2"),
                 filename="basic_solution.R"
-            ),
-            CodeSolution(
+            )),
+            CodeSolution.from_trusted(dict(
                 title="进阶解决方案",
                 code=f'# 方案二：进阶实现\nlibrary(dplyr)\nlibrary(ggplot2)\n\ndata %>%\n  filter(!is.na(value)) %>%\n  group_by(category) %>%\n  summarise(mean_val = mean(value)) %>%\n  ggplot(aes(x = category, y = mean_val)) +\n  geom_col()',
                 explanation="这是一个更高级的解决方案，使用了tidyverse生态系统，代码更简洁易读。",
                 difficulty="intermediate",
-                packages=["dplyr", "ggplot2"],
+                packages=("dplyr", "ggplot2"),
                 filename="advanced_solution.R"
-            ),
-            CodeSolution(
+            )),
+            CodeSolution.from_trusted(dict(
                 title="专业解决方案",
                 code=f'# 方案三：专业实现\nlibrary(data.table)\nlibrary(plotly)\n\nDT <- fread("data.csv")\nresult <- DT[, .(mean_val = mean(value, na.rm = TRUE)), by = category]\np <- plot_ly(result, x = ~category, y = ~mean_val, type = "bar")\np',
                 explanation="这是一个专业级的解决方案，使用了高性能的data.table包和交互式可视化。",
                 difficulty="advanced",
-                packages=["data.table", "plotly"],
+                packages=("data.table", "plotly"),
                 filename="professional_solution.R"
-            )
+            ))
         ]
         
         return solutions
@@ -212,7 +268,7 @@ class ConversationAgent(BaseAgent):
     async def process(self, state: WorkflowState) -> WorkflowState:
         """处理对话请求"""
         try:
-            state["processing_steps"].append(f"[{datetime.now()}] 开始智能对话")
+            record_step(state, "开始智能对话")
             
             message = state.get("user_input", "")
             if not message:
@@ -233,13 +289,14 @@ class ConversationAgent(BaseAgent):
             # 更新状态
             state["ai_response"] = response.content or "抱歉，我无法生成回复。"
             
-            # 添加到对话历史
+            # 添加到对话历史（同一轮的消息共用一个时间戳）
+            now = datetime.now()
             state["conversation_history"].extend([
-                Message(role="user", content=message),
-                Message(role="assistant", content=response.content)
+                Message.from_trusted({"role": "user", "content": message, "timestamp": now}),
+                Message.from_trusted({"role": "assistant", "content": response.content, "timestamp": now})
             ])
             
-            state["processing_steps"].append(f"[{datetime.now()}] 智能对话完成")
+            record_step(state, "智能对话完成")
             
             return state
             
@@ -265,7 +322,7 @@ class CodeAnalyzerAgent(BaseAgent):
     async def process(self, state: WorkflowState) -> WorkflowState:
         """处理代码分析请求"""
         try:
-            state["processing_steps"].append(f"[{datetime.now()}] 开始代码分析")
+            record_step(state, "开始代码分析")
             
             code = state.get("original_code") or state.get("user_input", "")
             if not code:
@@ -288,7 +345,7 @@ class CodeAnalyzerAgent(BaseAgent):
             
             # 更新状态
             state["code_analysis"] = analysis
-            state["processing_steps"].append(f"[{datetime.now()}] 代码分析完成")
+            record_step(state, "代码分析完成")
             
             return state
             
@@ -297,12 +354,12 @@ class CodeAnalyzerAgent(BaseAgent):
             state["warnings"].append(f"代码分析失败: {str(e)}")
             return state
     
-    def _parse_analysis(self, response: str) -> Dict[str, Any]:
+    def _parse_analysis(self, response: str) -> CodeAnalysisResult:
         """解析分析结果"""
-        return {
-            "analysis_result": response,
-            "quality_score": 8.5,  # 默认评分，实际应从AI回复中解析
-            "suggestions": ["建议添加错误处理", "可以优化循环性能"],
-            "complexity": "medium",
-            "maintainability": "good"
-        }
\ No newline at end of file
+        return CodeAnalysisResult(
+            analysis_result=response,
+            quality_score=8.5,  # 默认评分，实际应从AI回复中解析
+            suggestions=["建议添加错误处理", "可以优化循环性能"],
+            complexity="medium",
+            maintainability="good"
+        )
\ No newline at end of file
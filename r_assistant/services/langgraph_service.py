@@ -4,331 +4,83 @@
 """
 
 import asyncio
+import concurrent.futures
 import logging
-from typing import Dict, List, Any, Optional
+import os
+import string
+import threading
+from collections import OrderedDict
+from functools import lru_cache, partial, wraps
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime
+from types import MappingProxyType
 
 from django.conf import settings
-from .langgraph_workflow import workflow_engine
-from .workflow_state import Message, CodeSolution
+from pydantic import ValidationError
+from .workflow_state import Message, CodeSolution, MESSAGE_LIST_ADAPTER
 from .ai_service import AIServiceError
+from .response_cache import response_cache
+from .session_store import session_store
+from .semantic_cache import semantic_cache
 
 logger = logging.getLogger(__name__)
 
-
-class LangGraphService:
-    """基于LangGraph的智能服务"""
-    
-    def __init__(self):
-        self.workflow_engine = workflow_engine
-        try:
-            self.api_key_available = bool(getattr(settings, 'DEEPSEEK_API_KEY', ''))
-        except Exception:
-            import os
-            self.api_key_available = bool(os.environ.get('DEEPSEEK_API_KEY', ''))
-        
-    def _check_api_availability(self):
-        """检查API是否可用"""
-        api_key = getattr(settings, 'DEEPSEEK_API_KEY', '')
-        if not api_key or api_key.startswith('sk-请替换') or api_key == 'sk-placeholder-key-change-this':
-            logger.warning("DEEPSEEK_API_KEY未正确配置，使用演示模式")
-            return False
-        return True
-        
-    def _run_async(self, coro):
-        """在同步环境中运行异步代码"""
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        return loop.run_until_complete(coro)
-    
-    def _convert_history_to_messages(self, conversation_history: List[Dict[str, str]]) -> List[Message]:
-        """转换对话历史格式"""
-        messages = []
-        for item in conversation_history:
-            message = Message(
-                role=item.get("role", "user"),
-                content=item.get("content", ""),
-                timestamp=datetime.now()
-            )
-            messages.append(message)
-        return messages
-    
-    def _format_code_solutions(self, solutions: List[CodeSolution]) -> List[Dict[str, Any]]:
-        """格式化代码解决方案"""
-        formatted_solutions = []
-        for solution in solutions:
-            formatted_solutions.append({
-                "title": solution.title,
-                "code": solution.code,
-                "explanation": solution.explanation,
-                "difficulty": solution.difficulty,
-                "packages": solution.packages,
-                "filename": solution.filename
-            })
-        return formatted_solutions
-    
-    def explain_code(self, code: str, session_id: str = None, mode: str = 'full') -> Dict[str, Any]:
-        """代码解释服务 - 使用LangGraph工作流
-        
-        Args:
-            code: 要解释的代码
-            session_id: 会话ID
-            mode: 分析模式 ('full', 'selected')
-        """
-        try:
-            session_id = session_id or f"session_{datetime.now().timestamp()}"
-            
-            # 检查API可用性
-            if not self._check_api_availability():
-                return self._create_demo_response("explain", code, mode)
-            
-            # 执行工作流
-            result = self._run_async(
-                self.workflow_engine.execute_workflow(
-                    request_type="explain",
-                    user_input=code,
-                    session_id=session_id
-                )
-            )
-            
-            # 格式化返回结果
-            response = {
-                "content": result.get("explanation_result") or result.get("ai_response", ""),
-                "processing_time": result.get("processing_time", 0),
-                "usage": {"total_tokens": result.get("total_tokens", 0)},
-                "success": result.get("status") == "success",
-                "analysis_mode": mode,
-                "metadata": {
-                    "workflow_steps": result.get("processing_steps", []),
-                    "code_analysis": result.get("code_analysis"),
-                    "quality_score": result.get("quality_score"),
-                    "warnings": result.get("warnings", []),
-                    "errors": result.get("errors", [])
-                }
-            }
-            
-            if not response["success"]:
-                raise AIServiceError(f"代码解释失败: {'; '.join(result.get('errors', []))}")
-            
-            logger.info(f"代码解释完成（模式：{mode}），会话ID: {session_id}")
-            return response
-            
-        except Exception as e:
-            logger.error(f"代码解释服务失败: {str(e)}")
-            raise AIServiceError(f"代码解释失败: {str(e)}")
-    
-    def solve_problem(self, problem: str, session_id: str = None, uploaded_files: List[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """问题求解服务 - 使用LangGraph工作流，支持文件上传"""
-        try:
-            session_id = session_id or f"session_{datetime.now().timestamp()}"
-            
-            # 检查API可用性
-            if not self._check_api_availability():
-                return self._create_demo_response("solve", problem, uploaded_files)
-            
-            # 准备文件内容描述
-            file_context = ""
-            if uploaded_files:
-                file_context = "\n\n相关文件内容：\n"
-                for file_info in uploaded_files:
-                    file_context += f"\n--- 文件: {file_info['filename']} (类型: {file_info['type']}, 大小: {file_info['size']} 字节) ---\n"
-                    if file_info['content'].startswith('[二进制文件'):
-                        file_context += file_info['content'] + "\n"
-                    else:
-                        # 限制文件内容长度，避免过长
-                        content = file_info['content']
-                        if len(content) > 5000:
-                            content = content[:5000] + "\n... (内容被截断，文件过长)"
-                        file_context += content + "\n"
-                file_context += "\n请基于以上文件内容来解决问题。"
-            
-            # 组合问题描述和文件内容
-            enhanced_problem = problem + file_context
-            
-            # 执行工作流
-            result = self._run_async(
-                self.workflow_engine.execute_workflow(
-                    request_type="answer",
-                    user_input=enhanced_problem,
-                    session_id=session_id
-                )
-            )
-            
-            # 格式化解决方案
-            solutions = self._format_code_solutions(result.get("code_solutions", []))
-            
-            # 格式化返回结果
-            response = {
-                "content": result.get("ai_response", ""),
-                "solutions": solutions,
-                "processing_time": result.get("processing_time", 0),
-                "usage": {"total_tokens": result.get("total_tokens", 0)},
-                "success": result.get("status") == "success",
-                "metadata": {
-                    "workflow_steps": result.get("processing_steps", []),
-                    "problem_type": result.get("problem_type"),
-                    "warnings": result.get("warnings", []),
-                    "errors": result.get("errors", []),
-                    "uploaded_files_count": len(uploaded_files) if uploaded_files else 0
-                }
-            }
-            
-            if not response["success"]:
-                raise AIServiceError(f"问题求解失败: {'; '.join(result.get('errors', []))}")
-            
-            logger.info(f"问题求解完成，会话ID: {session_id}，生成{len(solutions)}个解决方案，包含{len(uploaded_files) if uploaded_files else 0}个文件")
-            return response
-            
-        except Exception as e:
-            logger.error(f"问题求解服务失败: {str(e)}")
-            raise AIServiceError(f"问题求解失败: {str(e)}")
-    
-    def chat(self, message: str, conversation_history: List[Dict[str, str]] = None, 
-             session_id: str = None) -> Dict[str, Any]:
-        """智能对话服务 - 使用LangGraph工作流"""
-        try:
-            session_id = session_id or f"session_{datetime.now().timestamp()}"
-            
-            # 检查API可用性
-            if not self._check_api_availability():
-                return self._create_demo_response("chat", message)
-            
-            # 转换对话历史
-            history_messages = self._convert_history_to_messages(conversation_history or [])
-            
-            # 执行工作流
-            result = self._run_async(
-                self.workflow_engine.execute_workflow(
-                    request_type="talk",
-                    user_input=message,
-                    session_id=session_id,
-                    conversation_history=history_messages
-                )
-            )
-            
-            # 格式化返回结果
-            response = {
-                "content": result.get("ai_response", ""),
-                "processing_time": result.get("processing_time", 0),
-                "usage": {"total_tokens": result.get("total_tokens", 0)},
-                "success": result.get("status") == "success",
-                "metadata": {
-                    "workflow_steps": result.get("processing_steps", []),
-                    "conversation_length": len(result.get("conversation_history", [])),
-                    "warnings": result.get("warnings", []),
-                    "errors": result.get("errors", [])
-                }
-            }
-            
-            # 检查是否有内容返回
-            if not response["content"] and response["success"]:
-                logger.warning("AI响应为空，但状态为成功")
-                response["content"] = "抱歉，我暂时无法生成回复，请稍后再试。"
-            
-            if not response["success"]:
-                error_msg = '; '.join(result.get('errors', [])) or "未知错误"
-                raise AIServiceError(f"智能对话失败: {error_msg}")
-            
-            logger.info(f"智能对话完成，会话ID: {session_id}")
-            return response
-            
-        except Exception as e:
-            logger.error(f"智能对话服务失败: {str(e)}")
-            raise AIServiceError(f"智能对话失败: {str(e)}")
-    
-    def analyze_code_quality(self, code: str, session_id: str = None) -> Dict[str, Any]:
-        """代码质量分析服务"""
-        try:
-            session_id = session_id or f"session_{datetime.now().timestamp()}"
-            
-            # 检查API可用性
-            if not self._check_api_availability():
-                return self._create_demo_response("analyze", code)
-            
-            # 执行代码解释工作流（包含分析）
-            result = self._run_async(
-                self.workflow_engine.execute_workflow(
-                    request_type="explain",
-                    user_input=code,
-                    session_id=session_id
-                )
-            )
-            
-            # 提取分析结果
-            analysis = result.get("code_analysis", {})
-            
-            response = {
-                "content": analysis.get("analysis_result", ""),
-                "quality_score": analysis.get("quality_score", 0),
-                "suggestions": analysis.get("suggestions", []),
-                "complexity": analysis.get("complexity", "unknown"),
-                "maintainability": analysis.get("maintainability", "unknown"),
-                "processing_time": result.get("processing_time", 0),
-                "usage": {"total_tokens": result.get("total_tokens", 0)},
-                "success": result.get("status") == "success"
-            }
-            
-            logger.info(f"代码质量分析完成，会话ID: {session_id}")
-            return response
-            
-        except Exception as e:
-            logger.error(f"代码质量分析失败: {str(e)}")
-            raise AIServiceError(f"代码质量分析失败: {str(e)}")
-    
-    def generate_tests(self, code: str, session_id: str = None) -> Dict[str, Any]:
-        """测试用例生成服务"""
-        # 暂时使用简化实现，可以后续扩展为完整的工作流
-        try:
-            test_code = f"""
+# 客户端对话历史转换结果最多缓存的会话数
+HISTORY_CACHE_SIZE = 256
+# 相同输入的工作流结果在完成后继续共享的时间（秒）
+INFLIGHT_TTL = 5.0
+# 单个上传文件写入提示词的最大字符数
+FILE_CONTENT_LIMIT = 5000
+# 所有上传文件写入提示词的总字节数上限，超出后不再追加文件
+MAX_FILE_CONTEXT_BYTES = 40 * 1024
+# 用户输入的最大字符数（可通过 LANGGRAPH_MAX_INPUT 配置），超出时不调用LLM
+MAX_INPUT = 200000
+# 超过该字节数的代码不做语义缓存（长代码仅有细微差别时容易误命中）
+SEMANTIC_CACHE_MAX_CODE_BYTES = 5000
+
+# 后台预取会话历史的线程池（单线程，避免和请求线程争抢数据库连接）
+_prewarm_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="langgraph-prewarm")
+
+
+def _prewarm_session(session_id: str):
+    from django.db import connection
+
+    try:
+        session_store.prefetch(session_id)
+    except Exception as e:
+        logger.warning("预取会话 %s 的历史失败: %s", session_id, e)
+    finally:
+        connection.close()
+
+# 测试用例与代码优化的静态模板（导入时构建一次，调用时只替换代码部分）
+_TEST_TEMPLATE = string.Template("""
 # 为以下代码生成的测试用例
 # 原始代码:
-{code}
+$code
 
 # 测试用例
 library(testthat)
 
-test_that("基本功能测试", {{
+test_that("基本功能测试", {
   # 测试基本功能
   expect_true(TRUE)
-}})
+})
 
-test_that("边界条件测试", {{
+test_that("边界条件测试", {
   # 测试边界条件
   expect_true(TRUE)
-}})
+})
 
-test_that("异常处理测试", {{
+test_that("异常处理测试", {
   # 测试异常处理
   expect_true(TRUE)
-}})
-"""
-            
-            response = {
-                "content": test_code,
-                "processing_time": 0.1,
-                "usage": {"total_tokens": 100},
-                "success": True
-            }
-            
-            logger.info(f"测试用例生成完成，会话ID: {session_id}")
-            return response
-            
-        except Exception as e:
-            logger.error(f"测试用例生成失败: {str(e)}")
-            raise AIServiceError(f"测试用例生成失败: {str(e)}")
-    
-    def optimize_code(self, code: str, session_id: str = None) -> Dict[str, Any]:
-        """代码优化服务"""
-        # 暂时使用简化实现，可以后续扩展为完整的工作流
-        try:
-            optimized_code = f"""
+})
+""")
+
+_OPTIMIZE_TEMPLATE = string.Template("""
 # 优化后的代码
 # 原始代码:
-{code}
+$code
 
 # 优化建议:
 # 1. 添加错误处理
@@ -336,67 +88,37 @@ test_that("异常处理测试", {{
 # 3. 提高可读性
 
 # 优化后的代码:
-{code}  # 这里应该是实际优化后的代码
-"""
-            
-            response = {
-                "content": optimized_code,
-                "processing_time": 0.1,
-                "usage": {"total_tokens": 100},
-                "success": True
-            }
-            
-            logger.info(f"代码优化完成，会话ID: {session_id}")
-            return response
-            
-        except Exception as e:
-            logger.error(f"代码优化失败: {str(e)}")
-            raise AIServiceError(f"代码优化失败: {str(e)}")
-    
-    def _create_demo_response(self, request_type: str, user_input: str, mode_or_files = 'full') -> Dict[str, Any]:
-        """创建演示响应（当API密钥不可用时）"""
-        # 处理参数兼容性
-        if isinstance(mode_or_files, list):
-            uploaded_files = mode_or_files
-            mode = 'full'
-            file_info = f"\n\n📎 **包含{len(uploaded_files)}个上传文件：**\n"
-            for file in uploaded_files:
-                file_info += f"- {file['filename']} ({file['type']}, {file['size']} 字节)\n"
-        else:
-            mode = mode_or_files
-            uploaded_files = None
-            file_info = ""
-        
-        demo_responses = {
-            "chat": f"🤖 **R语言智能助手演示模式**\n\n你好！我是R语言智能助手。\n\n**你说：** {user_input}\n\n---\n\n⚠️ **当前处于演示模式**\n\n要启用完整的AI功能，请按以下步骤配置API密钥：\n\n1. 访问 https://platform.deepseek.com 注册账号\n2. 获取您的API Key\n3. 在项目根目录的 `.env` 文件中设置：\n   ```\n   DEEPSEEK_API_KEY=你的API密钥\n   ```\n4. 重启服务器\n\n**配置完成后，我可以帮助你：**\n- 📝 解释R代码\n- 🔧 解决编程问题\n- 📚 提供学习建议\n- 📊 数据分析指导",
-            
-            "explain": f"📝 **代码解释功能演示{' - 选中代码分析' if mode == 'selected' else ''}**\n\n**你提交的代码：**\n```r\n{user_input}\n```\n\n---\n\n🎯 **演示解释：**\n\n这是一个演示响应。配置API密钥后，我将为你提供详细的代码分析，包括：\n\n- 📖 逐行代码解释\n- ⚙️ 函数功能说明  \n- ✨ 最佳实践建议\n- 🚀 性能优化方案\n\n{f'**当前选中代码分析模式** - 我会重点关注你选中的代码片段并结合完整上下文进行分析。' if mode == 'selected' else ''}\n\n---\n\n⚠️ **要启用完整功能，请配置DeepSeek API密钥：**\n\n1. 访问 https://platform.deepseek.com\n2. 在 `.env` 文件中设置 `DEEPSEEK_API_KEY`\n3. 重启服务器",
-            
-            "solve": f"🔧 **问题解决功能演示**\n\n**你的问题：** {user_input}{file_info}\n\n---\n\n🎯 **演示解决方案：**\n\n这是一个演示响应。配置API密钥后，我将提供：\n\n- 🔄 多种解决方案\n- 💻 详细代码实现\n- 📋 最佳实践指导\n- 📦 相关包推荐\n{f'- 📎 基于上传文件的个性化解决方案' if uploaded_files else ''}\n\n---\n\n⚠️ **配置API密钥以获得完整功能**",
-            
-            "analyze": f"📊 **代码分析功能演示**\n\n**你提交的代码：**\n```r\n{user_input}\n```\n\n---\n\n🎯 **演示分析：**\n\n配置API密钥后，我将提供：\n\n- 📈 代码质量评分\n- ⚡ 性能分析建议\n- 📏 代码规范检查\n- 🔧 优化建议\n\n---\n\n⚠️ **配置API密钥以获得完整功能**"
-        }
-        
-        response = {
-            "content": demo_responses.get(request_type, f"演示响应：{user_input}"),
-            "processing_time": 0.1,
-            "usage": {"total_tokens": 0},
-            "success": True,
-            "analysis_mode": mode,
-            "metadata": {
-                "demo_mode": True,
-                "api_key_required": True,
-                "message": "请配置DEEPSEEK_API_KEY以启用完整功能",
-                "uploaded_files_count": len(uploaded_files) if uploaded_files else 0
-            }
-        }
-        
-        # 为求解问题添加演示解决方案
-        if request_type == "solve":
-            response["solutions"] = [
-                {
-                    "title": "数据可视化方案",
-                    "code": """# 解决方案 1: 使用ggplot2创建散点图
+$code  # 这里应该是实际优化后的代码
+""")
+
+
+# 后台事件循环优先使用uvloop（Windows等不支持的平台自动回退），
+# 只替换本模块创建的循环，不修改全局事件循环策略
+try:
+    import uvloop
+    _new_event_loop = uvloop.new_event_loop
+except ImportError:
+    _new_event_loop = asyncio.new_event_loop
+
+# 演示模式（API密钥未配置时）的响应模板
+_DEMO_TEMPLATES = {
+    "chat": string.Template("🤖 **R语言智能助手演示模式**\n\n你好！我是R语言智能助手。\n\n**你说：** $user_input\n\n---\n\n⚠️ **当前处于演示模式**\n\n要启用完整的AI功能，请按以下步骤配置API密钥：\n\n1. 访问 https://platform.deepseek.com 注册账号\n2. 获取您的API Key\n3. 在项目根目录的 `.env` 文件中设置：\n   ```\n   DEEPSEEK_API_KEY=你的API密钥\n   ```\n4. 重启服务器\n\n**配置完成后，我可以帮助你：**\n- 📝 解释R代码\n- 🔧 解决编程问题\n- 📚 提供学习建议\n- 📊 数据分析指导"),
+
+    "explain": string.Template("📝 **代码解释功能演示$selected_title**\n\n**你提交的代码：**\n```r\n$user_input\n```\n\n---\n\n🎯 **演示解释：**\n\n这是一个演示响应。配置API密钥后，我将为你提供详细的代码分析，包括：\n\n- 📖 逐行代码解释\n- ⚙️ 函数功能说明  \n- ✨ 最佳实践建议\n- 🚀 性能优化方案\n\n$selected_note\n\n---\n\n⚠️ **要启用完整功能，请配置DeepSeek API密钥：**\n\n1. 访问 https://platform.deepseek.com\n2. 在 `.env` 文件中设置 `DEEPSEEK_API_KEY`\n3. 重启服务器"),
+
+    "solve": string.Template("🔧 **问题解决功能演示**\n\n**你的问题：** $user_input$file_info\n\n---\n\n🎯 **演示解决方案：**\n\n这是一个演示响应。配置API密钥后，我将提供：\n\n- 🔄 多种解决方案\n- 💻 详细代码实现\n- 📋 最佳实践指导\n- 📦 相关包推荐\n$upload_note\n\n---\n\n⚠️ **配置API密钥以获得完整功能**"),
+
+    "analyze": string.Template("📊 **代码分析功能演示**\n\n**你提交的代码：**\n```r\n$user_input\n```\n\n---\n\n🎯 **演示分析：**\n\n配置API密钥后，我将提供：\n\n- 📈 代码质量评分\n- ⚡ 性能分析建议\n- 📏 代码规范检查\n- 🔧 优化建议\n\n---\n\n⚠️ **配置API密钥以获得完整功能**"),
+}
+
+_SELECTED_NOTE = '**当前选中代码分析模式** - 我会重点关注你选中的代码片段并结合完整上下文进行分析。'
+
+
+# 演示模式的示例解决方案（只读，返回时复制）
+_DEMO_SOLUTIONS = tuple(MappingProxyType(solution) for solution in (
+    {
+        "title": "数据可视化方案",
+        "code": """# 解决方案 1: 使用ggplot2创建散点图
 library(ggplot2)
 data(mtcars)
 
@@ -414,7 +136,7 @@ print(p1)
 # 显示相关性
 correlation <- cor(mtcars$wt, mtcars$mpg)
 cat("相关系数:", round(correlation, 3))""",
-                    "explanation": """## 📊 详细解释
+        "explanation": """## 📊 详细解释
 
 ### 🎯 **解决方案概述**
 这个解决方案演示了如何使用R语言的ggplot2包来分析mtcars数据集，创建专业的散点图展示车重与油耗的关系。
@@ -472,13 +194,13 @@ correlation <- cor(mtcars$wt, mtcars$mpg)
 
 ---
 *💡 这是演示模式的详细解释。配置API密钥后，将提供基于实际数据的个性化分析。*""",
-                    "difficulty": "初级",
-                    "packages": ["ggplot2"],
-                    "filename": "mtcars_analysis.R"
-                },
-                {
-                    "title": "统计分析方案",
-                    "code": """# 解决方案 2: 综合统计分析
+        "difficulty": "初级",
+        "packages": ("ggplot2",),
+        "filename": "mtcars_analysis.R"
+    },
+    {
+        "title": "统计分析方案",
+        "code": """# 解决方案 2: 综合统计分析
 # 加载必要的包
 library(dplyr)
 library(corrplot)
@@ -509,7 +231,7 @@ print(summary(model))
 # 回归诊断图
 par(mfrow = c(2, 2))
 plot(model)""",
-                    "explanation": """## 🔬 综合统计分析详解
+        "explanation": """## 🔬 综合统计分析详解
 
 ### 🎯 **分析目标**
 对mtcars数据集进行全面的统计分析，探索多个变量与油耗的关系，建立预测模型。
@@ -596,13 +318,13 @@ plot(model)
 
 ---
 *🔬 这展示了完整的统计分析流程。在实际项目中，会根据具体需求调整分析方法。*""",
-                    "difficulty": "中级",
-                    "packages": ["dplyr", "corrplot"],
-                    "filename": "comprehensive_analysis.R"
-                },
-                {
-                    "title": "高级可视化方案",
-                    "code": """# 解决方案 3: 高级数据可视化
+        "difficulty": "中级",
+        "packages": ("dplyr", "corrplot"),
+        "filename": "comprehensive_analysis.R"
+    },
+    {
+        "title": "高级可视化方案",
+        "code": """# 解决方案 3: 高级数据可视化
 library(ggplot2)
 library(gridExtra)
 library(RColorBrewer)
@@ -658,7 +380,7 @@ interactive_plot <- plot_ly(mtcars, x = ~wt, y = ~mpg, size = ~hp,
 
 print("静态图表已生成")
 print("运行 interactive_plot 查看交互式图表")""",
-                    "explanation": """## 🎨 高级数据可视化详解
+        "explanation": """## 🎨 高级数据可视化详解
 
 ### 🎯 **可视化策略**
 采用多层次、多维度的可视化方法，全方位展示数据关系，提供直观且信息丰富的分析视角。
@@ -778,27 +500,806 @@ plot_ly() + add_markers()
 
 ---
 *🎨 这展示了R语言强大的可视化能力。每种图表都有其特定的使用场景和优势。*""",
-                    "difficulty": "高级",
-                    "packages": ["ggplot2", "gridExtra", "RColorBrewer", "plotly"],
-                    "filename": "advanced_visualization.R"
+        "difficulty": "高级",
+        "packages": ("ggplot2", "gridExtra", "RColorBrewer", "plotly"),
+        "filename": "advanced_visualization.R"
+    }
+))
+
+# 演示模式中每个上传文件的说明行
+_DEMO_FILE_LINE = "- {filename} ({type}, {size} 字节)\n"
+
+
+class _LoopThread:
+    """在守护线程中长期运行的事件循环（进程内单例）
+
+    所有工作流共用这一个事件循环，避免每个请求重复创建事件循环，并让LLM客户端的
+    连接池和keep-alive连接在请求之间保持可用。循环在首次使用时才启动，
+    避免在导入阶段（例如预加载后fork的worker）创建线程。
+    """
+    
+    _instance = None
+    _lock = threading.Lock()
+    
+    def __init__(self):
+        self.loop = _new_event_loop()
+        # Python 3.12+：任务创建时立即同步执行到第一个await，不挂起就完成的
+        # 工作流节点（问题分类、结果校验、最终化等）无需再经过一轮调度
+        eager_task_factory = getattr(asyncio, 'eager_task_factory', None)
+        if eager_task_factory is not None:
+            self.loop.set_task_factory(eager_task_factory)
+        self.thread = threading.Thread(
+            target=self.loop.run_forever,
+            name="langgraph-event-loop",
+            daemon=True
+        )
+        self.thread.start()
+    
+    @classmethod
+    def get(cls) -> "_LoopThread":
+        """获取单例，首次调用时启动后台线程"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
+    def run(self, coro):
+        """提交协程到后台事件循环并同步等待结果"""
+        if threading.current_thread() is self.thread:
+            # 在循环线程内同步等待会造成死锁，协程代码应直接await
+            coro.close()
+            raise RuntimeError("不能在后台事件循环线程中同步等待协程，请直接await")
+        # 直接在循环线程中create_task，省去run_coroutine_threadsafe/ensure_future的类型判断
+        future = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(self._start_task, coro, future)
+        return future.result()
+    
+    def _start_task(self, coro, future: concurrent.futures.Future):
+        """在循环线程中创建任务，完成后把结果转交给等待中的调用线程"""
+        try:
+            task = self.loop.create_task(coro)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        task.add_done_callback(partial(_transfer_result, future))
+
+
+def _transfer_result(future: concurrent.futures.Future, task: asyncio.Task):
+    """把任务结果（或异常、取消）转交给concurrent.futures.Future"""
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+def _service_method(label: str):
+    """服务方法装饰器：记录异常日志并统一转换为AIServiceError"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                logger.exception("%s服务失败", label)
+                raise AIServiceError(f"{label}失败: {str(e)}")
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=256)
+def _render_file_part(filename: str, file_type: str, size: int, content: str) -> Tuple[str, int]:
+    """渲染单个文件在提示词中的片段，返回 (片段, UTF-8字节数)
+
+    content 只需传入前 FILE_CONTENT_LIMIT + 1 个字符，重复提交相同文件时直接命中缓存。
+    """
+    if not content.startswith('[二进制文件') and len(content) > FILE_CONTENT_LIMIT:
+        # 限制文件内容长度，避免过长
+        content = content[:FILE_CONTENT_LIMIT] + "\n... (内容被截断，文件过长)"
+    part = f"\n--- 文件: {filename} (类型: {file_type}, 大小: {size} 字节) ---\n{content}\n"
+    return part, len(part.encode('utf-8'))
+
+
+def _build_file_context(uploaded_files: List[Dict[str, Any]]) -> Tuple[str, bool]:
+    """把上传文件拼接为提示词中的文件上下文，返回 (文件上下文, 是否因超出总字节数省略了文件)"""
+    parts = ["\n\n相关文件内容：\n"]
+    budget = MAX_FILE_CONTEXT_BYTES
+    truncated = False
+    for file_info in uploaded_files:
+        content = file_info['content']
+        if not content.startswith('[二进制文件'):
+            content = content[:FILE_CONTENT_LIMIT + 1]
+        part, size = _render_file_part(file_info['filename'], file_info['type'], file_info['size'], content)
+        budget -= size
+        if budget < 0:
+            truncated = True
+            parts.append("\n... (文件内容过多，其余文件已省略)\n")
+            break
+        parts.append(part)
+    parts.append("\n请基于以上文件内容来解决问题。")
+    return "".join(parts), truncated
+
+
+def _new_session_id() -> str:
+    """生成唯一的会话ID（128位随机数，并发请求下也不会冲突）"""
+    return f"session_{os.urandom(16).hex()}"
+
+
+class LangGraphService:
+    """基于LangGraph的智能服务"""
+    
+    # 对话历史超过该条数时，chat() 不读写响应缓存
+    CONVERSATION_HISTORY_THRESHOLD = 8
+    
+    __slots__ = (
+        "_workflow_engine", "api_key_available", "_api_ok",
+        "_inflight", "_history_cache", "_history_cache_lock",
+    )
+    
+    def __init__(self):
+        # 工作流引擎在首次使用时才导入（会加载LangGraph和LLM客户端）
+        self._workflow_engine = None
+        try:
+            self.api_key_available = bool(getattr(settings, 'DEEPSEEK_API_KEY', ''))
+        except Exception:
+            self.api_key_available = bool(os.environ.get('DEEPSEEK_API_KEY', ''))
+        
+        self.refresh()
+        
+        # 进行中的工作流：相同输入的并发请求共享同一次执行（只在后台事件循环中访问）
+        self._inflight = {}
+        
+        # 客户端对话历史转换缓存：session_id -> (已转换的原始条数, 最后一条原始消息, Message列表)
+        self._history_cache = OrderedDict()
+        self._history_cache_lock = threading.Lock()
+        
+    @property
+    def workflow_engine(self):
+        """工作流引擎（延迟导入，manage.py命令等只导入本模块时不加载LangGraph）"""
+        engine = self._workflow_engine
+        if engine is None:
+            from .langgraph_workflow import workflow_engine as engine
+            self._workflow_engine = engine
+        return engine
+    
+    def refresh(self):
+        """重新读取API密钥配置（修改settings后调用）"""
+        api_key = getattr(settings, 'DEEPSEEK_API_KEY', '')
+        self._api_ok = bool(
+            api_key
+            and not api_key.startswith('sk-请替换')
+            and api_key != 'sk-placeholder-key-change-this'
+        )
+        if not self._api_ok:
+            logger.warning("DEEPSEEK_API_KEY未正确配置，使用演示模式")
+    
+    @classmethod
+    def reload(cls):
+        """配置变更后刷新所有服务实例的API可用性"""
+        for service in LangGraphServiceFactory._instances.values():
+            service.refresh()
+    
+    def _check_api_availability(self):
+        """检查API是否可用（兼容旧调用，结果在初始化时计算并缓存）"""
+        return self._api_ok
+        
+    def _run_async(self, coro):
+        """在同步环境中运行异步代码（提交到后台事件循环并等待结果）"""
+        return _LoopThread.get().run(coro)
+    
+    async def _execute_workflow(self, request_type: str, **kwargs):
+        """执行工作流，相同输入的请求合并为一次执行
+
+        不带对话历史的请求（代码解释、代码质量分析、问题求解）按工作流类型和输入
+        合并：执行期间以及成功完成后 INFLIGHT_TTL 秒内的相同请求直接复用结果，
+        例如同一段代码的解释和质量分析只会调用一次LLM。
+        """
+        if kwargs.get("conversation_history"):
+            return await self.workflow_engine.execute_workflow(request_type=request_type, **kwargs)
+        
+        key = (request_type, kwargs["user_input"])
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self.workflow_engine.execute_workflow(request_type=request_type, **kwargs)
+            )
+            self._inflight[key] = future
+            future.add_done_callback(partial(self._release_inflight, key))
+        else:
+            logger.debug("复用进行中的%s工作流", request_type)
+        
+        # shield：某个等待方被取消时不影响其他共享该结果的请求
+        return dict(await asyncio.shield(future))
+    
+    def _release_inflight(self, key, future: asyncio.Future):
+        """工作流结束后移除合并记录，成功的结果保留 INFLIGHT_TTL 秒"""
+        def release():
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        
+        failed = future.cancelled() or future.exception() is not None or future.result().get("errors")
+        if failed:
+            release()
+        else:
+            asyncio.get_running_loop().call_later(INFLIGHT_TTL, release)
+    
+    def run_workflow(self, request_type: str, user_input: str, session_id: str,
+                     **workflow_kwargs) -> Dict[str, Any]:
+        """在后台事件循环中执行工作流并返回最终状态（供需要原始状态的视图使用）"""
+        return self._run_async(
+            self._execute_workflow(
+                request_type=request_type,
+                user_input=user_input,
+                session_id=session_id,
+                **workflow_kwargs
+            )
+        )
+    
+    def _run_service(self, request_type: str, user_input: str,
+                     response_builder: Callable[[Dict[str, Any]], Dict[str, Any]],
+                     cache_key: Optional[bytes], session_id: str,
+                     semantic_key: Optional[Tuple[str, str]] = None, **workflow_kwargs) -> Dict[str, Any]:
+        """执行一次工作流服务：查询缓存 → 执行工作流 → 构建响应 → 写入缓存
+
+        所有同步服务方法都经由这里执行工作流，缓存和批处理只需在此处接入。
+        response_builder 负责把工作流最终状态格式化为响应，success为False的响应不会被缓存。
+        cache_key 为None时不读写任何缓存；semantic_key 为 (分桶, 文本)，提供时在精确缓存
+        未命中后再查询语义缓存。
+        """
+        cached = response_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            logger.info("%s请求命中缓存，会话ID: %s", request_type, session_id)
+            return cached
+
+        if semantic_key is not None:
+            cached = semantic_cache.lookup(*semantic_key)
+            if cached is not None:
+                logger.info("%s请求命中语义缓存，会话ID: %s", request_type, session_id)
+                return cached
+
+        result = self.run_workflow(request_type, user_input, session_id, **workflow_kwargs)
+
+        response = response_builder(result)
+        if cache_key is None:
+            return response
+        response.setdefault("metadata", {})["cache_key"] = cache_key.hex()
+        if response.get("success"):
+            response_cache.set(cache_key, response)
+            if semantic_key is not None:
+                semantic_cache.insert(*semantic_key, response)
+        return response
+    
+    def _convert_history_to_messages(self, conversation_history: List[Dict[str, str]]) -> List[Message]:
+        """转换对话历史格式
+        
+        客户端传入的system角色消息会被丢弃：系统提示词由代理静态提供，
+        动态内容只能作为独立的user/assistant消息传给工作流。
+        已经是Message列表（如会话存储加载的历史）时直接返回。
+        """
+        if conversation_history and isinstance(conversation_history[0], Message):
+            return list(conversation_history)
+
+        # 客户端提供了时间戳时沿用，否则所有消息共用同一个转换时间
+        now = datetime.now()
+        rows = [
+            {
+                "role": item.get("role", "user"),
+                "content": item.get("content", ""),
+                "timestamp": item.get("timestamp") or now
+            }
+            for item in conversation_history
+            if item.get("role") != "system"
+        ]
+        try:
+            messages = MESSAGE_LIST_ADAPTER.validate_python(rows)
+        except ValidationError as e:
+            # 时间戳格式错误的消息改用转换时间，不因此拒绝整个请求
+            invalid = {error["loc"][0] for error in e.errors() if error["loc"][1:2] == ("timestamp",)}
+            if not invalid:
+                raise
+            logger.warning("对话历史中%d条消息的时间戳无效，已使用当前时间", len(invalid))
+            for index in invalid:
+                rows[index]["timestamp"] = now
+            messages = MESSAGE_LIST_ADAPTER.validate_python(rows)
+        if len(messages) != len(conversation_history):
+            logger.warning("忽略对话历史中的%d条system消息", len(conversation_history) - len(messages))
+        return messages
+    
+    def _get_history_messages(self, session_id: str, conversation_history: List[Dict[str, str]]) -> List[Message]:
+        """转换客户端传入的对话历史，只转换上一轮之后新增的部分
+
+        客户端每轮提交的历史通常是上一轮历史的追加扩展；缓存的前缀与本次历史
+        不一致（例如客户端截断了历史）时重新完整转换。
+        """
+        with self._history_cache_lock:
+            cached = self._history_cache.get(session_id)
+
+        converted, messages = 0, []
+        if cached is not None:
+            cached_len, last_item, cached_messages = cached
+            if (cached_len <= len(conversation_history)
+                    and conversation_history[cached_len - 1] == last_item):
+                converted, messages = cached_len, cached_messages
+
+        messages = messages + self._convert_history_to_messages(conversation_history[converted:])
+
+        if conversation_history:
+            with self._history_cache_lock:
+                self._history_cache[session_id] = (len(conversation_history), dict(conversation_history[-1]), messages)
+                self._history_cache.move_to_end(session_id)
+                while len(self._history_cache) > HISTORY_CACHE_SIZE:
+                    self._history_cache.popitem(last=False)
+
+        # 返回副本：工作流会在传入的列表上追加本轮对话
+        return list(messages)
+    
+    def _format_code_solutions(self, solutions: List[CodeSolution]) -> List[Dict[str, Any]]:
+        """格式化代码解决方案（每个元素都是新字典，调用方可以自由修改）"""
+        return [solution.as_dict() for solution in solutions]
+    
+    @_service_method("代码解释")
+    def explain_code(self, code: str, session_id: str = None, mode: str = 'full') -> Dict[str, Any]:
+        """代码解释服务 - 使用LangGraph工作流
+        
+        Args:
+            code: 要解释的代码
+            session_id: 会话ID
+            mode: 分析模式 ('full', 'selected')
+        """
+        session_id = session_id or _new_session_id()
+        
+        trivial = self._trivial_response("explain", code)
+        if trivial is not None:
+            return trivial
+        
+        # 检查API可用性
+        if not self._api_ok:
+            return self._create_demo_response("explain", code, mode)
+        
+        def build_response(result: Dict[str, Any]) -> Dict[str, Any]:
+            response = {
+                "content": result.get("explanation_result") or result.get("ai_response", ""),
+                "processing_time": result.get("processing_time", 0),
+                "usage": {"total_tokens": result.get("total_tokens", 0)},
+                "success": result.get("status") == "success",
+                "analysis_mode": mode,
+                "metadata": {
+                    "workflow_steps": result.get("processing_steps", []),
+                    "code_analysis": result.get("code_analysis"),
+                    "quality_score": result.get("quality_score"),
+                    "warnings": result.get("warnings", []),
+                    "errors": result.get("errors", [])
+                }
+            }
+            if not response["success"]:
+                raise AIServiceError(f"代码解释失败: {'; '.join(result.get('errors', []))}")
+            return response
+        
+        response = self._run_service(
+            "explain", code, build_response,
+            cache_key=response_cache.make_key("explain", code, mode=mode),
+            session_id=session_id,
+            semantic_key=(f"explain:{mode}", code)
+        )
+        logger.info("代码解释完成（模式：%s），会话ID: %s", mode, session_id)
+        return response
+    
+    @_service_method("问题求解")
+    def solve_problem(self, problem: str, session_id: str = None, uploaded_files: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """问题求解服务 - 使用LangGraph工作流，支持文件上传"""
+        session_id = session_id or _new_session_id()
+        
+        trivial = self._trivial_response("solve", problem)
+        if trivial is not None:
+            return trivial
+        
+        # 检查API可用性
+        if not self._api_ok:
+            return self._create_demo_response("solve", problem, uploaded_files)
+        
+        # 准备文件内容描述
+        file_context, files_truncated = _build_file_context(uploaded_files) if uploaded_files else ("", False)
+        
+        # 组合问题描述和文件内容
+        enhanced_problem = problem + file_context
+        
+        def build_response(result: Dict[str, Any]) -> Dict[str, Any]:
+            response = {
+                "content": result.get("ai_response", ""),
+                "solutions": self._format_code_solutions(result.get("code_solutions", [])),
+                "processing_time": result.get("processing_time", 0),
+                "usage": {"total_tokens": result.get("total_tokens", 0)},
+                "success": result.get("status") == "success",
+                "metadata": {
+                    "workflow_steps": result.get("processing_steps", []),
+                    "problem_type": result.get("problem_type"),
+                    "warnings": result.get("warnings", []),
+                    "errors": result.get("errors", []),
+                    "uploaded_files_count": len(uploaded_files) if uploaded_files else 0,
+                    "files_truncated": files_truncated
                 }
-            ]
+            }
+            if not response["success"]:
+                raise AIServiceError(f"问题求解失败: {'; '.join(result.get('errors', []))}")
+            return response
+        
+        response = self._run_service(
+            "answer", enhanced_problem, build_response,
+            cache_key=response_cache.make_key("answer", enhanced_problem),
+            session_id=session_id,
+            semantic_key=("answer", enhanced_problem)
+        )
+        logger.info("问题求解完成，会话ID: %s，生成%d个解决方案，包含%d个文件",
+                    session_id, len(response["solutions"]), len(uploaded_files) if uploaded_files else 0)
+        return response
+    
+    @_service_method("智能对话")
+    def chat(self, message: str, conversation_history: List[Dict[str, str]] = None, 
+             session_id: str = None) -> Dict[str, Any]:
+        """智能对话服务 - 使用LangGraph工作流
+        
+        Args:
+            message: 本轮用户消息
+            conversation_history: 为None时从服务端会话存储加载历史，并在完成后写回本轮对话；
+                显式传入时按传入内容使用且不写入会话存储
+            session_id: 会话ID
+        """
+        session_id = session_id or _new_session_id()
+        
+        use_session_store = conversation_history is None
         
+        trivial = self._trivial_response("chat", message)
+        if trivial is not None:
+            return trivial
+        
+        # 检查API可用性
+        if not self._api_ok:
+            response = self._create_demo_response("chat", message)
+            if use_session_store:
+                session_store.append_turn(session_id, message, response["content"])
+            return response
+        
+        # 加载对话历史
+        if use_session_store:
+            history_messages = session_store.load(session_id)
+        else:
+            history_messages = self._get_history_messages(session_id, conversation_history)
+        
+        # 长对话的回复高度依赖上下文，几乎不会命中缓存，直接执行工作流
+        if len(history_messages) > self.CONVERSATION_HISTORY_THRESHOLD:
+            cache_key = semantic_key = None
+        else:
+            # 缓存键中包含最近的对话历史摘要；语义缓存同时比较最近两条消息
+            cache_key = response_cache.make_key("talk", message, history_messages)
+            context = [item.content for item in history_messages[-2:]]
+            semantic_key = ("talk", "\n".join(context + [message]))
+        
+        response = self._run_service(
+            "talk", message, self._build_chat_response,
+            cache_key=cache_key,
+            session_id=session_id,
+            semantic_key=semantic_key,
+            conversation_history=history_messages
+        )
+        if use_session_store:
+            session_store.append_turn(
+                session_id, message, response["content"],
+                tokens=response["usage"]["total_tokens"]
+            )
+        logger.info("智能对话完成，会话ID: %s", session_id)
         return response
 
+    def _build_chat_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """把对话工作流的最终状态格式化为响应，失败时抛出AIServiceError"""
+        response = {
+            "content": result.get("ai_response", ""),
+            "processing_time": result.get("processing_time", 0),
+            "usage": {"total_tokens": result.get("total_tokens", 0)},
+            "success": result.get("status") == "success",
+            "metadata": {
+                "workflow_steps": result.get("processing_steps", []),
+                "conversation_length": len(result.get("conversation_history", [])),
+                "warnings": result.get("warnings", []),
+                "errors": result.get("errors", [])
+            }
+        }
 
-# 创建服务工厂
-class LangGraphServiceFactory:
-    """LangGraph服务工厂"""
+        # 检查是否有内容返回
+        if not response["content"] and response["success"]:
+            logger.warning("AI响应为空，但状态为成功")
+            response["content"] = "抱歉，我暂时无法生成回复，请稍后再试。"
+
+        if not response["success"]:
+            error_msg = '; '.join(result.get('errors', [])) or "未知错误"
+            raise AIServiceError(f"智能对话失败: {error_msg}")
+
+        return response
+
+    async def chat_stream(self, message: str, session_id: str,
+                          history_messages: List[Message]) -> AsyncIterator[Dict[str, Any]]:
+        """流式智能对话，在后台事件循环中运行
+
+        依次产出 {"type": "token", "content": 增量文本} 事件，最后产出
+        {"type": "result", "response": 完整响应}。不访问数据库，会话历史的
+        加载与写回由调用方负责。
+        """
+        if len(history_messages) > self.CONVERSATION_HISTORY_THRESHOLD:
+            cache_key = response = None
+        else:
+            cache_key = response_cache.make_key("talk", message, history_messages)
+            response = response_cache.get(cache_key)
+        if response is not None:
+            logger.info("智能对话命中缓存，会话ID: %s", session_id)
+            yield {"type": "result", "response": response}
+            return
+
+        async for event in self.workflow_engine.stream_workflow(
+            request_type="talk",
+            user_input=message,
+            session_id=session_id,
+            conversation_history=history_messages
+        ):
+            if event["type"] == "token" and event["node"] == "conversation":
+                yield {"type": "token", "content": event["content"]}
+            elif event["type"] == "final":
+                response = self._build_chat_response(event["state"])
+                if cache_key is not None:
+                    response["metadata"]["cache_key"] = cache_key.hex()
+                    response_cache.set(cache_key, response)
+                yield {"type": "result", "response": response}
+
+    def prewarm_chat(self, session_id: str):
+        """在后台预取会话历史，供该会话接下来的对话请求直接使用（不阻塞调用方）"""
+        if session_id:
+            _prewarm_executor.submit(_prewarm_session, session_id)
+
+    def stream_chat(self, message: str, session_id: str = None) -> Iterator[Dict[str, Any]]:
+        """流式智能对话的同步入口，供StreamingHttpResponse逐项消费
+
+        事件格式同 chat_stream；对话历史从会话存储加载，完成后写回本轮对话。
+        """
+        session_id = session_id or _new_session_id()
+
+        trivial = self._trivial_response("chat", message)
+        if trivial is not None:
+            yield {"type": "result", "response": trivial}
+            return
+
+        # 检查API可用性
+        if not self._api_ok:
+            response = self._create_demo_response("chat", message)
+            session_store.append_turn(session_id, message, response["content"])
+            yield {"type": "result", "response": response}
+            return
+
+        history_messages = session_store.load(session_id)
+        try:
+            for event in self._iterate_async(self.chat_stream(message, session_id, history_messages)):
+                if event["type"] == "result":
+                    response = event["response"]
+                    session_store.append_turn(
+                        session_id, message, response["content"],
+                        tokens=response["usage"]["total_tokens"]
+                    )
+                    logger.info("流式智能对话完成，会话ID: %s", session_id)
+                yield event
+        except AIServiceError:
+            raise
+        except Exception as e:
+            logger.exception("流式智能对话失败")
+            raise AIServiceError(f"智能对话失败: {str(e)}")
+
+    def _iterate_async(self, agen: AsyncIterator[Any]) -> Iterator[Any]:
+        """在同步环境中逐项消费异步生成器（每一项都在后台事件循环中取得）"""
+        loop_thread = _LoopThread.get()
+        try:
+            while True:
+                try:
+                    yield loop_thread.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop_thread.run(agen.aclose())
+
+    @_service_method("代码质量分析")
+    def analyze_code_quality(self, code: str, session_id: str = None) -> Dict[str, Any]:
+        """代码质量分析服务"""
+        session_id = session_id or _new_session_id()
+        
+        trivial = self._trivial_response("analyze", code)
+        if trivial is not None:
+            return trivial
+        
+        # 检查API可用性
+        if not self._api_ok:
+            return self._create_demo_response("analyze", code)
+        
+        def build_response(result: Dict[str, Any]) -> Dict[str, Any]:
+            # 提取分析结果
+            analysis = result.get("code_analysis", {})
+            return {
+                "content": analysis.get("analysis_result", ""),
+                "quality_score": analysis.get("quality_score", 0),
+                "suggestions": analysis.get("suggestions", []),
+                "complexity": analysis.get("complexity", "unknown"),
+                "maintainability": analysis.get("maintainability", "unknown"),
+                "processing_time": result.get("processing_time", 0),
+                "usage": {"total_tokens": result.get("total_tokens", 0)},
+                "success": result.get("status") == "success"
+            }
+        
+        # 执行代码解释工作流（包含分析）
+        response = self._run_service(
+            "explain", code, build_response,
+            cache_key=response_cache.make_key("analyze", code),
+            session_id=session_id,
+            semantic_key=("analyze", code) if len(code.encode('utf-8')) <= SEMANTIC_CACHE_MAX_CODE_BYTES else None
+        )
+        logger.info("代码质量分析完成，会话ID: %s", session_id)
+        return response
+    
+    def generate_tests(self, code: str, session_id: str = None) -> Dict[str, Any]:
+        """测试用例生成服务
+        
+        静态模板实现，保持为纯同步调用，不经过后台事件循环。
+        """
+        # 暂时使用简化实现，可以后续扩展为完整的工作流
+        try:
+            test_code = _TEST_TEMPLATE.substitute(code=code)
+            
+            response = {
+                "content": test_code,
+                "processing_time": 0.1,
+                "usage": {"total_tokens": 100},
+                "success": True
+            }
+            
+            logger.info("测试用例生成完成，会话ID: %s", session_id)
+            return response
+            
+        except Exception as e:
+            logger.exception("测试用例生成失败")
+            raise AIServiceError(f"测试用例生成失败: {str(e)}")
+    
+    def optimize_code(self, code: str, session_id: str = None) -> Dict[str, Any]:
+        """代码优化服务
+        
+        静态模板实现，保持为纯同步调用，不经过后台事件循环。
+        """
+        # 暂时使用简化实现，可以后续扩展为完整的工作流
+        try:
+            optimized_code = _OPTIMIZE_TEMPLATE.substitute(code=code)
+            
+            response = {
+                "content": optimized_code,
+                "processing_time": 0.1,
+                "usage": {"total_tokens": 100},
+                "success": True
+            }
+            
+            logger.info("代码优化完成，会话ID: %s", session_id)
+            return response
+            
+        except Exception as e:
+            logger.exception("代码优化失败")
+            raise AIServiceError(f"代码优化失败: {str(e)}")
     
     @staticmethod
-    def get_service(service_type: str = 'langgraph') -> LangGraphService:
-        """获取LangGraph服务实例"""
-        if service_type == 'langgraph':
-            return LangGraphService()
+    def _trivial_response(request_type: str, user_input: str) -> Optional[Dict[str, Any]]:
+        """空输入、超长输入或明显不是有效内容的输入直接返回提示，不调用LLM
+
+        request_type 与 _create_demo_response 相同（chat/explain/solve/analyze）；
+        输入正常时返回None。
+        """
+        text = user_input.strip() if user_input else ""
+        max_input = getattr(settings, 'LANGGRAPH_MAX_INPUT', MAX_INPUT)
+        if not text:
+            content = "请输入内容后再提交。"
+        elif len(user_input) > max_input:
+            content = f"输入内容过长（{len(user_input)}字符），请精简到{max_input}字符以内后重试。"
+        elif request_type != "chat" and len(text) > 20 and len(set(text)) < 5:
+            # 代码和问题描述不会只由几个字符重复组成
+            content = "输入内容似乎不是有效的R代码或问题描述，请检查后重试。"
         else:
-            raise AIServiceError(f"Unsupported service type: {service_type}")
+            return None
+        
+        response = {
+            "content": content,
+            "processing_time": 0.0,
+            "usage": {"total_tokens": 0},
+            "success": True,
+            "metadata": {"short_circuited": True}
+        }
+        if request_type == "solve":
+            response["solutions"] = []
+        elif request_type == "analyze":
+            response.update(quality_score=0, suggestions=[], complexity="unknown", maintainability="unknown")
+        return response
+    
+    def _create_demo_response(self, request_type: str, user_input: str, mode_or_files = 'full') -> Dict[str, Any]:
+        """创建演示响应（当API密钥不可用时）
+        
+        各服务方法在转换对话历史、访问事件循环之前就检查演示模式并直接调用这里。
+        """
+        # 处理参数兼容性
+        if isinstance(mode_or_files, list):
+            uploaded_files = mode_or_files
+            mode = 'full'
+            # 只有问题求解模板展示文件列表
+            file_info = f"\n\n📎 **包含{len(uploaded_files)}个上传文件：**\n" + "".join(
+                _DEMO_FILE_LINE.format_map(file) for file in uploaded_files
+            ) if request_type == "solve" else ""
+        else:
+            mode = mode_or_files
+            uploaded_files = None
+            file_info = ""
+        
+        template = _DEMO_TEMPLATES.get(request_type)
+        if template is not None:
+            content = template.safe_substitute(
+                user_input=user_input,
+                selected_title=' - 选中代码分析' if mode == 'selected' else '',
+                selected_note=_SELECTED_NOTE if mode == 'selected' else '',
+                file_info=file_info,
+                upload_note='- 📎 基于上传文件的个性化解决方案' if uploaded_files else ''
+            )
+        else:
+            content = f"演示响应：{user_input}"
+        
+        response = {
+            "content": content,
+            "processing_time": 0.1,
+            "usage": {"total_tokens": 0},
+            "success": True,
+            "analysis_mode": mode,
+            "metadata": {
+                "demo_mode": True,
+                "api_key_required": True,
+                "message": "请配置DEEPSEEK_API_KEY以启用完整功能",
+                "uploaded_files_count": len(uploaded_files) if uploaded_files else 0
+            }
+        }
+        
+        # 为求解问题添加演示解决方案
+        if request_type == "solve":
+            response["solutions"] = [dict(solution) for solution in _DEMO_SOLUTIONS]
+        
+        return response
 
 
-# 全局服务实例
-langgraph_service = LangGraphServiceFactory.get_service()
\ No newline at end of file
+# 创建服务工厂
+class LangGraphServiceFactory:
+    """LangGraph服务工厂"""
+    
+    # 每种服务类型只创建一个实例，保证缓存、批处理器等状态在全进程共享
+    _instances: Dict[str, LangGraphService] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get_service(cls, service_type: str = 'langgraph') -> LangGraphService:
+        """获取LangGraph服务实例（单例）"""
+        if service_type != 'langgraph':
+            raise AIServiceError(f"Unsupported service type: {service_type}")
+        
+        service = cls._instances.get(service_type)
+        if service is None:
+            with cls._lock:
+                service = cls._instances.get(service_type)
+                if service is None:
+                    service = cls._instances[service_type] = LangGraphService()
+        return service
+
+
+@lru_cache(maxsize=1)
+def get_langgraph_service() -> LangGraphService:
+    """获取全局服务实例（首次调用时创建，而不是在导入时）"""
+    return LangGraphServiceFactory.get_service()
+
+
+def __getattr__(name):
+    # 兼容旧的 `from services.langgraph_service import langgraph_service` 用法
+    if name == 'langgraph_service':
+        return get_langgraph_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
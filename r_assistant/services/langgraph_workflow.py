@@ -5,14 +5,19 @@ LangGraph工作流引擎
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Any, Optional
 from datetime import datetime
 import uuid
 
 from langgraph.graph import StateGraph, END, START
 from langgraph.checkpoint.memory import MemorySaver
 
-from .workflow_state import WorkflowState, Message, WorkflowConfig
+from .workflow_state import (
+    WorkflowState, Message, WorkflowConfig, CONVERSATION_HISTORY_MAXLEN, record_step, format_steps
+)
 from .langgraph_agents import (
     CodeExplainerAgent, 
     ProblemSolverAgent, 
@@ -23,6 +28,17 @@ from .langgraph_agents import (
 logger = logging.getLogger(__name__)
 
 
+# 问题分类关键词（按顺序匹配，先命中的类别优先），导入时编译为正则表达式
+_PROBLEM_CATEGORIES = tuple(
+    (re.compile("|".join(map(re.escape, keywords))), problem_type)
+    for keywords, problem_type in (
+        (("画图", "绘图", "plot", "graph"), "visualization"),
+        (("统计", "分析", "analysis"), "statistics"),
+        (("数据处理", "清洗", "clean"), "data_processing"),
+    )
+)
+
+
 class WorkflowEngine:
     """LangGraph工作流引擎"""
     
@@ -81,30 +97,27 @@ class WorkflowEngine:
         
         self.workflows["talk"] = talk_workflow.compile(checkpointer=self.memory)
     
-    async def execute_workflow(self, request_type: str, user_input: str, 
-                             session_id: str, conversation_history: List[Message] = None) -> WorkflowState:
-        """执行工作流"""
-        
-        if request_type not in self.workflows:
-            raise ValueError(f"Unsupported workflow type: {request_type}")
-        
-        # 初始化状态
-        initial_state = WorkflowState(
+    def _create_initial_state(self, request_type: str, user_input: str, session_id: str,
+                              conversation_history: List[Message] = None) -> WorkflowState:
+        """创建工作流初始状态"""
+        return WorkflowState(
             session_id=session_id,
             request_id=str(uuid.uuid4()),
             request_type=request_type,
             user_input=user_input,
             original_code=user_input if request_type == "explain" else None,
             problem_description=user_input if request_type == "answer" else None,
-            conversation_history=conversation_history or [],
+            conversation_history=deque(conversation_history or (), maxlen=CONVERSATION_HISTORY_MAXLEN),
             ai_response=None,
             code_solutions=[],
             explanation_result=None,
             code_analysis=None,
             quality_score=None,
             complexity_analysis=None,
+            problem_type=None,
             processing_steps=[],
             start_time=datetime.now(),
+            start_perf_ns=time.perf_counter_ns(),
             end_time=None,
             total_tokens=0,
             errors=[],
@@ -112,19 +125,27 @@ class WorkflowEngine:
             next_step=None,
             workflow_complete=False
         )
+    
+    async def execute_workflow(self, request_type: str, user_input: str, 
+                             session_id: str, conversation_history: List[Message] = None) -> WorkflowState:
+        """执行工作流"""
+        
+        workflow = self.workflows.get(request_type)
+        if workflow is None:
+            raise ValueError(f"Unsupported workflow type: {request_type}")
+        
+        initial_state = self._create_initial_state(request_type, user_input, session_id, conversation_history)
         
         try:
             logger.info(f"开始执行{request_type}工作流，会话ID: {session_id}")
             
             # 执行工作流
-            workflow = self.workflows[request_type]
-            config = {"configurable": {"thread_id": session_id}}
-            
-            final_state = await workflow.ainvoke(initial_state, config)
+            final_state = await workflow.ainvoke(initial_state, {"configurable": {"thread_id": session_id}})
             
             # 标记完成
             final_state["end_time"] = datetime.now()
             final_state["workflow_complete"] = True
+            format_steps(final_state)
             
             logger.info(f"{request_type}工作流执行完成，会话ID: {session_id}")
             return final_state
@@ -133,8 +154,55 @@ class WorkflowEngine:
             logger.error(f"工作流执行失败: {str(e)}")
             initial_state["errors"].append(f"工作流执行失败: {str(e)}")
             initial_state["end_time"] = datetime.now()
+            format_steps(initial_state)
             return initial_state
     
+    async def stream_workflow(self, request_type: str, user_input: str, session_id: str,
+                              conversation_history: List[Message] = None) -> AsyncIterator[Dict[str, Any]]:
+        """流式执行工作流，边执行边产出事件
+
+        事件格式：
+            {"type": "token", "node": 节点名, "content": 增量文本}  LLM生成的文本片段
+            {"type": "step", "node": 节点名}                        节点执行完成
+            {"type": "final", "state": 最终状态}                    工作流结束（始终是最后一个事件）
+        """
+        workflow = self.workflows.get(request_type)
+        if workflow is None:
+            raise ValueError(f"Unsupported workflow type: {request_type}")
+
+        initial_state = self._create_initial_state(request_type, user_input, session_id, conversation_history)
+        final_state = dict(initial_state)
+
+        try:
+            logger.info(f"开始流式执行{request_type}工作流，会话ID: {session_id}")
+
+            async for mode, chunk in workflow.astream(initial_state, {"configurable": {"thread_id": session_id}}, stream_mode=["messages", "updates"]):
+                if mode == "messages":
+                    message_chunk, metadata = chunk
+                    if message_chunk.content:
+                        yield {
+                            "type": "token",
+                            "node": metadata.get("langgraph_node"),
+                            "content": message_chunk.content
+                        }
+                else:
+                    for node, update in chunk.items():
+                        if update:
+                            final_state.update(update)
+                        yield {"type": "step", "node": node}
+
+            final_state["end_time"] = datetime.now()
+            final_state["workflow_complete"] = True
+            logger.info(f"{request_type}工作流流式执行完成，会话ID: {session_id}")
+
+        except Exception as e:
+            logger.error(f"工作流执行失败: {str(e)}")
+            final_state["errors"].append(f"工作流执行失败: {str(e)}")
+            final_state["end_time"] = datetime.now()
+
+        format_steps(final_state)
+        yield {"type": "final", "state": final_state}
+
     # 工作流节点实现
     
     async def _analyze_code_node(self, state: WorkflowState) -> WorkflowState:
@@ -147,22 +215,19 @@ class WorkflowEngine:
     
     async def _analyze_problem_node(self, state: WorkflowState) -> WorkflowState:
         """问题分析节点"""
-        state["processing_steps"].append(f"[{datetime.now()}] 开始问题分析")
+        record_step(state, "开始问题分析")
         
         # 这里可以添加问题分析逻辑
         problem = state.get("user_input", "")
         
         # 简单的问题分类
-        if any(keyword in problem.lower() for keyword in ["画图", "绘图", "plot", "graph"]):
-            state["problem_type"] = "visualization"
-        elif any(keyword in problem.lower() for keyword in ["统计", "分析", "analysis"]):
-            state["problem_type"] = "statistics"
-        elif any(keyword in problem.lower() for keyword in ["数据处理", "清洗", "clean"]):
-            state["problem_type"] = "data_processing"
-        else:
-            state["problem_type"] = "general"
+        problem = problem.lower()
+        state["problem_type"] = next(
+            (problem_type for pattern, problem_type in _PROBLEM_CATEGORIES if pattern.search(problem)),
+            "general"
+        )
         
-        state["processing_steps"].append(f"[{datetime.now()}] 问题分析完成，类型: {state.get('problem_type', 'unknown')}")
+        record_step(state, f"问题分析完成，类型: {state.get('problem_type', 'unknown')}")
         return state
     
     async def _solve_problem_node(self, state: WorkflowState) -> WorkflowState:
@@ -171,7 +236,7 @@ class WorkflowEngine:
     
     async def _validate_solutions_node(self, state: WorkflowState) -> WorkflowState:
         """解决方案验证节点"""
-        state["processing_steps"].append(f"[{datetime.now()}] 开始解决方案验证")
+        record_step(state, "开始解决方案验证")
         
         solutions = state.get("code_solutions", [])
         
@@ -183,7 +248,7 @@ class WorkflowEngine:
             if not solution.packages:
                 state["warnings"].append(f"解决方案{i+1}未指定所需R包")
         
-        state["processing_steps"].append(f"[{datetime.now()}] 解决方案验证完成")
+        record_step(state, "解决方案验证完成")
         return state
     
     async def _conversation_node(self, state: WorkflowState) -> WorkflowState:
@@ -192,7 +257,7 @@ class WorkflowEngine:
     
     async def _context_enhancement_node(self, state: WorkflowState) -> WorkflowState:
         """上下文增强节点"""
-        state["processing_steps"].append(f"[{datetime.now()}] 开始上下文增强")
+        record_step(state, "开始上下文增强")
         
         # 这里可以添加上下文增强逻辑，比如：
         # - 检查是否需要补充信息
@@ -203,39 +268,37 @@ class WorkflowEngine:
         if ai_response and len(ai_response) < 50:
             state["warnings"].append("AI回复较短，可能需要更多上下文")
         
-        state["processing_steps"].append(f"[{datetime.now()}] 上下文增强完成")
+        record_step(state, "上下文增强完成")
         return state
     
     async def _finalize_node(self, state: WorkflowState) -> WorkflowState:
         """最终化节点"""
-        logger.info("执行 finalize 节点")
-        state["processing_steps"].append(f"[{datetime.now()}] 开始最终化处理")
+        record_step(state, "开始最终化处理")
         
         # 设置结束时间（如果未设置）
         if not state.get("end_time"):
             state["end_time"] = datetime.now()
         
-        # 计算总处理时间
-        if state.get("start_time") and state.get("end_time"):
-            processing_time = (state["end_time"] - state["start_time"]).total_seconds()
-            state["processing_time"] = processing_time
+        # 计算总处理时间（单调时钟，不受系统时间调整影响）
+        state["processing_time"] = (time.perf_counter_ns() - state["start_perf_ns"]) / 1e9
         
         # 生成摘要
-        if state.get("errors"):
+        errors = state.get("errors")
+        warnings = state.get("warnings")
+        if errors:
             state["status"] = "error"
-            state["summary"] = f"处理失败: {'; '.join(state['errors'])}"
-            logger.info("设置状态为 error")
-        elif state.get("warnings"):
+            state["summary"] = f"处理失败: {'; '.join(errors)}"
+        elif warnings:
             state["status"] = "warning"
-            state["summary"] = f"处理完成但有警告: {'; '.join(state['warnings'])}"
-            logger.info("设置状态为 warning")
+            state["summary"] = f"处理完成但有警告: {'; '.join(warnings)}"
         else:
             state["status"] = "success"
             state["summary"] = "处理成功完成"
-            logger.info("设置状态为 success")
         
-        state["processing_steps"].append(f"[{datetime.now()}] 最终化处理完成")
-        logger.info(f"finalize完成，最终状态: {state.get('status')}")
+        record_step(state, "最终化处理完成")
+        format_steps(state)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("finalize完成，最终状态: %s", state["status"])
         return state
 
 
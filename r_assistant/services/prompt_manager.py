@@ -3,38 +3,64 @@
 集中管理所有AI提示词模板 - 使用新的模块化提示词系统
 """
 
+from functools import partial
+from types import MappingProxyType
+
 from .advanced_prompt_manager import advanced_prompt_manager
 
 
+def _bind(category: str, prompt_type: str, *fields: str):
+    """导入时解析提示词模板，返回直接格式化模板的函数
+
+    模板不存在或无法用给定字段格式化时，回退到 advanced_prompt_manager.get_prompt
+    （由其记录错误并返回后备提示词）。
+    """
+    template = advanced_prompt_manager.prompts.get(category, {}).get(prompt_type)
+    try:
+        template.format(**dict.fromkeys(fields, ""))
+    except (AttributeError, IndexError, KeyError, ValueError):
+        return partial(advanced_prompt_manager.get_prompt, category, prompt_type)
+    return template.format
+
+
+_EXPLAIN_USER = _bind('code_explainer', 'user_template', 'code', 'additional_context')
+_ANSWER_USER = _bind('problem_solver', 'user_template', 'problem_description', 'additional_requirements')
+_TALK_USER = _bind('conversation', 'user_template', 'message', 'conversation_context')
+_ERROR_EXPLANATION = _bind('code_explainer', 'error_explanation', 'code', 'error_msg')
+_DATA_ANALYSIS = _bind('problem_solver', 'data_analysis_template',
+                       'data_description', 'analysis_goal', 'expected_output', 'additional_context')
+_VISUALIZATION = _bind('problem_solver', 'visualization_request',
+                       'data_features', 'chart_type', 'visualization_goal', 'style_preferences')
+
+# 分析类型 -> 预先绑定的代码分析提示词
+_ANALYSIS_MAP = MappingProxyType({
+    analysis_type: _bind('code_analyzer', prompt_type, 'code', 'code_purpose', 'additional_context')
+    for analysis_type, prompt_type in (
+        ('quality', 'quality_analysis'),
+        ('performance', 'performance_analysis'),
+        ('style', 'style_check'),
+        ('security', 'security_analysis'),
+    )
+})
+
+
 class PromptManager:
     """提示词管理器类 - 重构以使用新的提示词系统"""
     
     @staticmethod
     def get_explain_prompt(code: str, additional_context: str = "") -> str:
         """获取代码解释提示词"""
-        return advanced_prompt_manager.get_prompt(
-            'code_explainer', 'user_template',
-            code=code, 
-            additional_context=additional_context
-        )
+        return _EXPLAIN_USER(code=code, additional_context=additional_context)
     
     @staticmethod
     def get_answer_prompt(problem: str, additional_requirements: str = "") -> str:
         """获取作业求解提示词"""
-        return advanced_prompt_manager.get_prompt(
-            'problem_solver', 'user_template',
-            problem_description=problem,
-            additional_requirements=additional_requirements
-        )
+        return _ANSWER_USER(problem_description=problem, additional_requirements=additional_requirements)
     
     @staticmethod
     def get_talk_prompt(message: str, conversation_context: str = "") -> str:
         """获取对话提示词"""
-        return advanced_prompt_manager.get_prompt(
-            'conversation', 'user_template',
-            message=message,
-            conversation_context=conversation_context
-        )
+        return _TALK_USER(message=message, conversation_context=conversation_context)
     
     @staticmethod
     def get_system_prompt(agent_type: str = "base") -> str:
@@ -46,36 +72,18 @@ class PromptManager:
     @staticmethod
     def get_analysis_prompt(code: str, analysis_type: str = "quality") -> str:
         """获取代码分析提示词"""
-        prompt_map = {
-            'quality': 'quality_analysis',
-            'performance': 'performance_analysis', 
-            'style': 'style_check',
-            'security': 'security_analysis'
-        }
-        
-        prompt_type = prompt_map.get(analysis_type, 'quality_analysis')
-        
-        return advanced_prompt_manager.get_prompt(
-            'code_analyzer', prompt_type,
-            code=code,
-            code_purpose="代码分析",
-            additional_context=""
-        )
+        format_prompt = _ANALYSIS_MAP.get(analysis_type) or _ANALYSIS_MAP['quality']
+        return format_prompt(code=code, code_purpose="代码分析", additional_context="")
     
     @staticmethod
     def get_error_explanation_prompt(code: str, error_msg: str) -> str:
         """获取错误解释提示词"""
-        return advanced_prompt_manager.get_prompt(
-            'code_explainer', 'error_explanation',
-            code=code,
-            error_msg=error_msg
-        )
+        return _ERROR_EXPLANATION(code=code, error_msg=error_msg)
     
     @staticmethod
     def get_data_analysis_prompt(data_description: str, analysis_goal: str, expected_output: str = "") -> str:
         """获取数据分析提示词"""
-        return advanced_prompt_manager.get_prompt(
-            'problem_solver', 'data_analysis_template',
+        return _DATA_ANALYSIS(
             data_description=data_description,
             analysis_goal=analysis_goal,
             expected_output=expected_output,
@@ -85,8 +93,7 @@ class PromptManager:
     @staticmethod
     def get_visualization_prompt(data_features: str, chart_type: str = "自动选择", visualization_goal: str = "") -> str:
         """获取可视化提示词"""
-        return advanced_prompt_manager.get_prompt(
-            'problem_solver', 'visualization_request',
+        return _VISUALIZATION(
             data_features=data_features,
             chart_type=chart_type,
             visualization_goal=visualization_goal,
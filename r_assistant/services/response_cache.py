@@ -0,0 +1,171 @@
+"""
+工作流响应缓存
+基于Django缓存框架保存相同输入的工作流结果，命中时无需再次调用LLM。
+配置Redis等共享缓存后端时，多个进程之间共享缓存结果。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+from django.core.cache import caches
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:
+    _blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+# 对话缓存键只考虑最近的N条历史消息
+HISTORY_DIGEST_MESSAGES = 10
+# 缓存键前缀
+KEY_PREFIX = "workflow_response"
+# 进程内一级缓存的最大条目数
+LOCAL_CACHE_SIZE = 1024
+# 进程内缓存代数的有效时间（秒），其他进程调用clear()后最多延迟这么久生效
+GENERATION_TTL = 5.0
+
+
+def _digest(data: bytes) -> bytes:
+    """计算128位非加密摘要：优先blake3，其次xxh3_128，都未安装时使用blake2b"""
+    if _blake3 is not None:
+        return _blake3(data).digest(16)
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+@lru_cache(maxsize=4096)
+def _message_digest(role: str, content: str) -> bytes:
+    """单条历史消息的摘要（对话追加一轮时，之前的消息直接命中缓存）"""
+    return _digest(f"{role}\0{content}".encode('utf-8'))
+
+
+class ResponseCache:
+    """基于Django缓存后端的工作流响应缓存
+
+    clear() 通过递增缓存代数使旧条目全部失效，不会影响同一缓存后端中的其他数据。
+    Django缓存之前还有一层进程内LRU缓存，重复提交相同请求时无需访问缓存后端
+    和反序列化响应；缓存代数也在进程内保留 GENERATION_TTL 秒，一级缓存命中时完全
+    不访问缓存后端。一级缓存的键同样包含缓存代数，其他进程调用clear()后最多
+    GENERATION_TTL 秒内也会失效。
+    """
+
+    def __init__(self, timeout: int = 3600, alias: str = 'default', local_size: int = LOCAL_CACHE_SIZE):
+        self.timeout = timeout
+        self.alias = alias
+        self.local_size = local_size
+        # 缓存键 -> (过期时间, 响应)
+        self._local = OrderedDict()
+        self._local_lock = threading.Lock()
+        # (过期时间, 缓存代数)
+        self._local_generation = (0.0, 0)
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def make_key(request_type: str, user_input: str,
+                 conversation_history: List[Any] = None, mode: str = '') -> bytes:
+        """根据请求类型、分析模式、用户输入和最近的对话历史生成缓存键
+
+        历史消息逐条计算摘要后再参与键的计算，长对话中只有新增的消息需要重新哈希。
+        """
+        history = []
+        for item in (conversation_history or [])[-HISTORY_DIGEST_MESSAGES:]:
+            if isinstance(item, dict):
+                history.append(_message_digest(item.get("role", "user"), item.get("content", "")))
+            else:
+                history.append(_message_digest(item.role, item.content))
+
+        payload = (request_type, mode, user_input.strip(), b"".join(history).hex())
+        if orjson is not None:
+            data = orjson.dumps(payload)
+        else:
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        return _digest(data)
+
+    def _generation(self) -> int:
+        """当前缓存代数（进程内保留 GENERATION_TTL 秒，过期后才重新读取缓存后端）"""
+        expires, generation = self._local_generation
+        now = time.monotonic()
+        if expires < now:
+            generation = self._cache.get_or_set(f"{KEY_PREFIX}:generation", 0, None)
+            self._local_generation = (now + GENERATION_TTL, generation)
+        return generation
+
+    def _cache_key(self, key: bytes) -> str:
+        return f"{KEY_PREFIX}:{self._generation()}:{key.hex()}"
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """获取缓存的响应（标记 metadata["cache_hit"]），未命中或已过期时返回None"""
+        cache_key = self._cache_key(key)
+        response = self._local_get(cache_key)
+        if response is None:
+            response = self._cache.get(cache_key)
+            if response is None:
+                return None
+            self._local_set(cache_key, response)
+
+        # 返回副本，调用方修改响应时不影响一级缓存中的条目
+        response = dict(response)
+        response["metadata"] = dict(response.get("metadata") or {}, cache_hit=True)
+        return response
+
+    def set(self, key: bytes, response: Dict[str, Any]):
+        """写入缓存"""
+        cache_key = self._cache_key(key)
+        self._cache.set(cache_key, response, self.timeout)
+        self._local_set(cache_key, dict(response, metadata=dict(response.get("metadata") or {})))
+
+    def _local_get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        with self._local_lock:
+            entry = self._local.get(cache_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[cache_key]
+                return None
+            self._local.move_to_end(cache_key)
+            return entry[1]
+
+    def _local_set(self, cache_key: str, response: Dict[str, Any]):
+        with self._local_lock:
+            self._local[cache_key] = (time.monotonic() + self.timeout, response)
+            self._local.move_to_end(cache_key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def clear(self):
+        """使所有已缓存的响应失效"""
+        generation_key = f"{KEY_PREFIX}:generation"
+        try:
+            generation = self._cache.incr(generation_key)
+        except ValueError:
+            generation = 1
+            self._cache.set(generation_key, generation, None)
+        self._local_generation = (time.monotonic() + GENERATION_TTL, generation)
+        with self._local_lock:
+            self._local.clear()
+        logger.info("响应缓存已清空")
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
@@ -0,0 +1,119 @@
+"""
+语义响应缓存
+对用户输入计算句向量，与已缓存输入的余弦相似度超过阈值时直接复用响应，
+措辞略有不同的重复问题也无需再次调用LLM。
+
+依赖 sentence-transformers（可选），未安装或未启用 SEMANTIC_CACHE_ENABLED 时不生效。
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+# 默认句向量模型
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+
+
+class SemanticResponseCache:
+    """基于句向量相似度的进程内响应缓存
+
+    条目按分桶（请求类型）分别保存，每个分桶最多保留 max_entries 条，
+    超出后淘汰最久未命中的条目。
+    """
+
+    def __init__(self, threshold: float = 0.87, max_entries: int = 1000,
+                 model_name: str = DEFAULT_MODEL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.model_name = model_name
+        self._model = None
+        # bucket -> OrderedDict[输入文本, (归一化向量, 响应)]
+        self._buckets: Dict[str, OrderedDict] = {}
+        # bucket -> (输入文本列表, 向量矩阵)，写入后重建，查询时一次矩阵乘法算出全部相似度
+        self._matrices: Dict[str, Tuple[List[str], Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return SentenceTransformer is not None and getattr(settings, 'SEMANTIC_CACHE_ENABLED', False)
+
+    def _embed(self, text: str):
+        """计算归一化句向量（模型在首次使用时加载）"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info("加载语义缓存模型: %s", self.model_name)
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model.encode(text, normalize_embeddings=True)
+
+    def lookup(self, bucket: str, text: str) -> Optional[Dict[str, Any]]:
+        """查找语义相近的已缓存响应（标记 metadata["semantic_cache_hit"]），未命中时返回None"""
+        if not self.enabled:
+            return None
+
+        embedding = self._embed(text)
+        with self._lock:
+            entries = self._buckets.get(bucket)
+            if not entries:
+                return None
+
+            keys, matrix = self._matrix(bucket, entries)
+            scores = matrix @ embedding
+            best = int(scores.argmax())
+            best_key, best_score = keys[best], float(scores[best])
+            if best_score < self.threshold:
+                return None
+
+            entries.move_to_end(best_key)
+            response = dict(entries[best_key][1])
+
+        response["metadata"] = dict(response.get("metadata") or {}, semantic_cache_hit=True,
+                                    semantic_similarity=round(best_score, 4))
+        return response
+
+    def insert(self, bucket: str, text: str, response: Dict[str, Any]):
+        """写入缓存，超出容量时淘汰最久未命中的条目"""
+        if not self.enabled:
+            return
+
+        embedding = self._embed(text)
+        with self._lock:
+            entries = self._buckets.setdefault(bucket, OrderedDict())
+            entries[text] = (embedding, response)
+            entries.move_to_end(text)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._matrices.pop(bucket, None)
+
+    def _matrix(self, bucket: str, entries: OrderedDict):
+        """分桶内所有向量堆叠成的矩阵（需持有锁）"""
+        cached = self._matrices.get(bucket)
+        if cached is None:
+            keys = list(entries)
+            cached = self._matrices[bucket] = (keys, np.stack([entries[key][0] for key in keys]))
+        return cached
+
+    def clear(self):
+        """清空所有缓存条目"""
+        with self._lock:
+            self._buckets.clear()
+            self._matrices.clear()
+
+
+# 全局语义缓存实例
+semantic_cache = SemanticResponseCache(
+    threshold=getattr(settings, 'SEMANTIC_CACHE_THRESHOLD', 0.87),
+    max_entries=getattr(settings, 'SEMANTIC_CACHE_MAX_ENTRIES', 1000)
+)
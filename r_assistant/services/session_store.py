@@ -0,0 +1,154 @@
+"""
+会话记忆存储
+在服务端按会话ID保存对话消息，客户端每轮只需提交新的用户输入
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .workflow_state import Message
+
+logger = logging.getLogger(__name__)
+
+# 摘要中每条旧消息保留的字符数
+SUMMARY_SNIPPET_CHARS = 100
+# 摘要总长度上限，超出后只保留最新的部分
+SUMMARY_MAX_CHARS = 2000
+# 摘要在缓存中的保留时间（秒）
+SUMMARY_CACHE_TIMEOUT = 24 * 3600
+# 预取的会话历史保留时间（秒）
+PREFETCH_TTL = 60
+
+_ROLE_LABELS = {'user': '用户', 'assistant': '助手'}
+
+
+class SessionStore:
+    """基于ConversationHistory模型的会话消息存储
+
+    会话较长时，最近 last_k 条之前的消息被压缩为一条滚动摘要，摘要每积累
+    summary_interval 条旧消息才重新生成一次，因此送入工作流的历史长度
+    始终不超过 1 + last_k + summary_interval - 1 条。
+    """
+
+    def __init__(self, last_k: int = 20, summary_interval: int = 10):
+        self.last_k = last_k
+        self.summary_interval = summary_interval
+        # session_id -> (过期时间, 预取时的消息条数, 消息列表)
+        self._prefetched: Dict[str, Tuple[float, int, List[Message]]] = {}
+        self._prefetch_lock = threading.Lock()
+
+    def load(self, session_id: str, last_k: int = None) -> List[Message]:
+        """按时间顺序加载会话历史：[摘要消息（如有）, *最近的原始消息]
+
+        若该会话刚被预取过且消息条数未变，直接返回预取结果。
+        """
+        from core.models import ConversationHistory
+
+        queryset = ConversationHistory.objects.filter(session_id=session_id).order_by('timestamp')
+        total = queryset.count()
+
+        if not last_k or last_k == self.last_k:
+            with self._prefetch_lock:
+                prefetched = self._prefetched.pop(session_id, None)
+            if prefetched and prefetched[0] > time.monotonic() and prefetched[1] == total:
+                return list(prefetched[2])
+
+        return self._load(session_id, queryset, total, last_k or self.last_k)
+
+    def prefetch(self, session_id: str):
+        """预先加载会话历史（及摘要），供接下来的对话请求直接使用"""
+        from core.models import ConversationHistory
+
+        queryset = ConversationHistory.objects.filter(session_id=session_id).order_by('timestamp')
+        total = queryset.count()
+        messages = self._load(session_id, queryset, total, self.last_k)
+        now = time.monotonic()
+        with self._prefetch_lock:
+            # 顺带清理过期未使用的预取结果
+            for key in [key for key, entry in self._prefetched.items() if entry[0] <= now]:
+                del self._prefetched[key]
+            self._prefetched[session_id] = (now + PREFETCH_TTL, total, messages)
+
+    def _load(self, session_id: str, queryset, total: int, last_k: int) -> List[Message]:
+        """从数据库加载会话历史（total 为会话消息总数）"""
+        older = total - last_k
+        if older <= 0:
+            return self._to_messages(queryset.values('role', 'content', 'timestamp'))
+
+        # 摘要覆盖的消息数按 summary_interval 取整，避免每轮都重新生成摘要
+        covered = older - older % self.summary_interval
+        messages = self._to_messages(queryset.values('role', 'content', 'timestamp')[covered:])
+        if covered:
+            summary = self._get_summary(session_id, queryset, covered)
+            messages.insert(0, Message.from_trusted({'role': 'system', 'content': summary,
+                                                     'metadata': {'summary': True}}))
+        return messages
+
+    def append_turn(self, session_id: str, user_content: str, assistant_content: str,
+                    tokens: int = 0):
+        """写入一轮对话（用户消息 + AI回复）"""
+        from core.models import ConversationHistory
+
+        # 显式错开时间戳，保证同一轮内用户消息排在AI回复之前
+        now = timezone.now()
+        with self._prefetch_lock:
+            self._prefetched.pop(session_id, None)
+        ConversationHistory.objects.bulk_create([
+            ConversationHistory(session_id=session_id, role='user',
+                                content=user_content, timestamp=now),
+            ConversationHistory(session_id=session_id, role='assistant',
+                                content=assistant_content, tokens=tokens,
+                                timestamp=now + timedelta(microseconds=1)),
+        ])
+        logger.debug("会话 %s 写入一轮对话", session_id)
+
+    def clear(self, session_id: str) -> int:
+        """清空会话历史，同时丢弃该会话的摘要和预取结果，返回删除的消息数"""
+        from core.models import ConversationHistory
+
+        with self._prefetch_lock:
+            self._prefetched.pop(session_id, None)
+        cache.delete(f"session_summary:{session_id}")
+        deleted_count = ConversationHistory.objects.filter(session_id=session_id).delete()[0]
+        logger.debug("会话 %s 已清空 %d 条对话", session_id, deleted_count)
+        return deleted_count
+
+    def _to_messages(self, rows) -> List[Message]:
+        """把查询结果转换为Message列表（数据库中的记录写入时已校验，不再重复校验）"""
+        return [Message.from_trusted(row) for row in rows]
+
+    def _get_summary(self, session_id: str, queryset, covered: int) -> str:
+        """获取覆盖前 covered 条消息的摘要，只对新增的旧消息做增量压缩"""
+        cache_key = f"session_summary:{session_id}"
+        cached: Tuple[int, str] = cache.get(cache_key) or (0, "")
+        summarized, summary = cached
+
+        if summarized == covered:
+            return summary
+        if summarized > covered:
+            # 会话被清空或截断过，重新生成
+            summarized, summary = 0, ""
+
+        lines = [summary] if summary else ["以下是本次会话较早对话的摘要："]
+        for row in queryset.values('role', 'content')[summarized:covered]:
+            content = " ".join(row['content'].split())
+            if len(content) > SUMMARY_SNIPPET_CHARS:
+                content = content[:SUMMARY_SNIPPET_CHARS] + "..."
+            lines.append(f"- {_ROLE_LABELS.get(row['role'], row['role'])}: {content}")
+
+        summary = "\n".join(lines)
+        if len(summary) > SUMMARY_MAX_CHARS:
+            summary = summary[-SUMMARY_MAX_CHARS:]
+
+        cache.set(cache_key, (covered, summary), SUMMARY_CACHE_TIMEOUT)
+        return summary
+
+
+# 全局会话存储实例
+session_store = SessionStore()
@@ -3,9 +3,12 @@ LangGraph工作流状态定义
 定义所有工作流中使用的状态结构
 """
 
-from typing import TypedDict, List, Dict, Any, Optional, Annotated
-from pydantic import BaseModel, Field
-from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
+from typing import TypedDict, List, Dict, Any, Optional, Annotated, Deque, NamedTuple, Tuple, Union
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from datetime import datetime, timedelta
+import time
 import uuid
 
 
@@ -16,16 +19,58 @@ class Message(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
+    @classmethod
+    def from_trusted(cls, data: Dict[str, Any]) -> "Message":
+        """从可信数据（如数据库记录、服务端生成的内容）构建，跳过校验"""
+        return cls.model_construct(**data)
+
+
+# 批量校验客户端传入的消息列表（一次调用完成整个列表的校验）
+MESSAGE_LIST_ADAPTER = TypeAdapter(List[Message])
+
 
 class CodeSolution(BaseModel):
-    """代码解决方案模型"""
+    """代码解决方案模型（不可变、可哈希，便于缓存其格式化结果）"""
+    model_config = ConfigDict(frozen=True)
+
     title: str = Field(..., description="解决方案标题")
     code: str = Field(..., description="R代码")
     explanation: str = Field(..., description="代码解释")
     difficulty: str = Field(default="basic", description="难度级别: basic/intermediate/advanced")
-    packages: List[str] = Field(default_factory=list, description="所需R包")
+    packages: Tuple[str, ...] = Field(default_factory=tuple, description="所需R包")
     filename: str = Field(default="solution.R", description="建议文件名")
 
+    @classmethod
+    def from_trusted(cls, data: Dict[str, Any]) -> "CodeSolution":
+        """从可信数据构建，跳过校验（packages必须已经是元组）"""
+        return cls.model_construct(**data)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典（内容相同的解决方案只转换一次，返回副本）"""
+        return dict(_solution_items(self))
+
+
+_SOLUTION_FIELDS = tuple(CodeSolution.model_fields)
+_get_solution_fields = attrgetter(*_SOLUTION_FIELDS)
+
+
+@lru_cache(maxsize=4096)
+def _solution_items(solution: CodeSolution) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(zip(_SOLUTION_FIELDS, _get_solution_fields(solution)))
+
+
+class CodeAnalysisResult(TypedDict):
+    """代码分析结果（只在工作流内部传递，不做校验）"""
+    analysis_result: str
+    quality_score: float
+    suggestions: List[str]
+    complexity: str
+    maintainability: str
+
+
+# 工作流状态中保留的对话消息数上限
+CONVERSATION_HISTORY_MAXLEN = 64
+
 
 class WorkflowState(TypedDict):
     """LangGraph工作流状态"""
@@ -39,8 +84,8 @@ class WorkflowState(TypedDict):
     original_code: Optional[str]
     problem_description: Optional[str]
     
-    # 对话历史
-    conversation_history: List[Message]
+    # 对话历史（有界队列，超出 CONVERSATION_HISTORY_MAXLEN 后自动丢弃最早的消息）
+    conversation_history: Deque[Message]
     
     # 处理结果
     ai_response: Optional[str]
@@ -48,13 +93,15 @@ class WorkflowState(TypedDict):
     explanation_result: Optional[str]
     
     # 分析结果
-    code_analysis: Optional[Dict[str, Any]]
+    code_analysis: Optional[CodeAnalysisResult]
     quality_score: Optional[float]
     complexity_analysis: Optional[Dict[str, Any]]
+    problem_type: Optional[str]  # 问题求解工作流中识别出的问题类型
     
     # 元数据
-    processing_steps: List[str]
+    processing_steps: List[Union[str, Tuple[int, str]]]  # 执行期间为 (perf_counter_ns, 描述)，结束时格式化为文本
     start_time: datetime
+    start_perf_ns: int  # 开始时的 time.perf_counter_ns()，用于计算步骤时间和处理时间
     end_time: Optional[datetime]
     total_tokens: int
     
@@ -72,8 +119,24 @@ class WorkflowState(TypedDict):
     processing_time: Optional[float]  # 处理时间（秒）
 
 
-class AgentConfig(BaseModel):
-    """代理配置"""
+def record_step(state: WorkflowState, description: str):
+    """记录处理步骤（只读取单调时钟，时间戳在 format_steps 中统一生成）"""
+    state["processing_steps"].append((time.perf_counter_ns(), description))
+
+
+def format_steps(state: WorkflowState):
+    """把 (perf_counter_ns, 描述) 形式的处理步骤转换为 "[时间戳] 描述" 文本"""
+    start_time = state["start_time"]
+    start_ns = state["start_perf_ns"]
+    state["processing_steps"] = [
+        step if isinstance(step, str)
+        else f"[{start_time + timedelta(microseconds=(step[0] - start_ns) // 1000)}] {step[1]}"
+        for step in state["processing_steps"]
+    ]
+
+
+class AgentConfig(NamedTuple):
+    """代理配置（只在启动时构建一次、不需要校验，用 NamedTuple 即可）"""
     name: str
     role: str
     system_prompt: str
@@ -82,7 +145,7 @@ class AgentConfig(BaseModel):
     model: str = "deepseek-chat"
 
 
-class WorkflowConfig(BaseModel):
+class WorkflowConfig(NamedTuple):
     """工作流配置"""
     workflow_type: str
     agents: List[AgentConfig]
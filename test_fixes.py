@@ -11,17 +11,17 @@ sys.path.append('r_assistant')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'r_assistant.settings')
 django.setup()
 
-from core.models import RequestLog, CodeSolution, ConversationHistory, UserSession
+from core.models import RequestLog, CodeSolution, ConversationHistory, UserSession, REQUEST_LOG_FIELDS, CODE_SOLUTION_FIELDS
 
 def test_models():
     """测试模型定义"""
     print("测试模型...")
     
     # 测试字段存在
-    request_log_fields = [field.name for field in RequestLog._meta.fields]
+    request_log_fields = REQUEST_LOG_FIELDS
     print(f"RequestLog字段: {request_log_fields}")
     
-    code_solution_fields = [field.name for field in CodeSolution._meta.fields]
+    code_solution_fields = CODE_SOLUTION_FIELDS
     print(f"CodeSolution字段: {code_solution_fields}")
     
     # 检查关键字段
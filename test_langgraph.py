@@ -22,7 +22,7 @@ except Exception as e:
     sys.exit(1)
 
 
-async def test_langgraph_integration():
+async def run_langgraph_integration():
     """测试LangGraph工作流集成"""
     
     print("=" * 60)
@@ -65,9 +65,14 @@ async def test_langgraph_integration():
         
         # 测试2: 代理初始化
         print("\n2. 测试代理初始化...")
-        code_explainer = CodeExplainerAgent()
-        problem_solver = ProblemSolverAgent()
-        conversation_agent = ConversationAgent()
+        # 并发初始化各代理（代理共享同一个HTTP连接池）
+        async with asyncio.TaskGroup() as tg:
+            code_explainer = tg.create_task(asyncio.to_thread(CodeExplainerAgent))
+            problem_solver = tg.create_task(asyncio.to_thread(ProblemSolverAgent))
+            conversation_agent = tg.create_task(asyncio.to_thread(ConversationAgent))
+        code_explainer, problem_solver, conversation_agent = (
+            code_explainer.result(), problem_solver.result(), conversation_agent.result()
+        )
         print("✓ 所有代理初始化成功")
         
         # 测试3: 工作流引擎
@@ -88,10 +93,10 @@ async def test_langgraph_integration():
         
         # 测试5: 数据模型
         print("\n5. 测试数据模型...")
-        from core.models import RequestLog, CodeSolution, ConversationHistory
+        from core.models import REQUEST_LOG_FIELDS, CODE_SOLUTION_FIELDS
         
         # 检查模型字段
-        request_log_fields = [field.name for field in RequestLog._meta.fields]
+        request_log_fields = REQUEST_LOG_FIELDS
         required_fields = ['session_id', 'request_type', 'input_content', 'response_content', 'success']
         missing_fields = [field for field in required_fields if field not in request_log_fields]
         
@@ -100,7 +105,7 @@ async def test_langgraph_integration():
         else:
             print(f"✗ RequestLog缺失字段: {missing_fields}")
         
-        code_solution_fields = [field.name for field in CodeSolution._meta.fields]
+        code_solution_fields = CODE_SOLUTION_FIELDS
         if 'request_log' in code_solution_fields:
             print("✓ CodeSolution关联字段正确")
         else:
@@ -129,6 +134,11 @@ async def test_langgraph_integration():
         return False
 
 
+def test_langgraph_integration():
+    """同步入口，供 pytest 收集异步集成测试"""
+    assert asyncio.run(run_langgraph_integration()), "LangGraph工作流集成测试失败"
+
+
 def test_configuration():
     """测试配置"""
     print("\n配置检查:")
@@ -166,7 +176,7 @@ if __name__ == '__main__':
     test_configuration()
     
     # 运行异步测试
-    success = asyncio.run(test_langgraph_integration())
+    success = asyncio.run(run_langgraph_integration())
     
     if success:
         print("\n🎉 LangGraph工作流系统测试通过！")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+测试会话存储、响应缓存和历史记录增量加载接口
+setup_module/teardown_module 创建并销毁测试数据库，直接运行脚本或通过 pytest 运行时
+均不会修改 db.sqlite3；单独导入并调用测试函数时没有这层隔离
+"""
+import os
+import sys
+import uuid
+from datetime import timedelta
+
+import django
+
+# 设置Django环境
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'r_assistant'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'r_assistant.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+_old_db_config = None
+
+
+def setup_module(module=None):
+    """创建测试数据库，避免测试写入开发数据库"""
+    global _old_db_config
+    setup_test_environment()
+    _old_db_config = setup_databases(verbosity=0, interactive=False)
+
+
+def teardown_module(module=None):
+    """销毁测试数据库并恢复测试环境"""
+    teardown_databases(_old_db_config, verbosity=0)
+    teardown_test_environment()
+
+
+def test_session_store():
+    """测试会话历史的加载、写入、摘要和清空"""
+    print("测试会话存储...")
+
+    from services.session_store import SessionStore
+
+    store = SessionStore(last_k=4, summary_interval=2)
+    session_id = f"test-{uuid.uuid4().hex}"
+
+    # 写入与加载
+    store.append_turn(session_id, "问题0", "回答0")
+    messages = store.load(session_id)
+    assert [(m.role, m.content) for m in messages] == [("user", "问题0"), ("assistant", "回答0")], \
+        "加载的消息应按写入顺序排列，用户消息在前"
+
+    # 超过 last_k 后较早的消息被压缩为摘要
+    for i in range(1, 5):
+        store.append_turn(session_id, f"问题{i}", f"回答{i}")
+    messages = store.load(session_id)
+    assert len(messages) == 5, f"应返回1条摘要和4条最近消息，实际{len(messages)}条"
+    assert messages[0].role == "system" and messages[0].metadata.get("summary"), "第一条应为摘要消息"
+    assert "问题0" in messages[0].content, "摘要应包含最早的消息"
+    assert [m.content for m in messages[1:]] == ["问题3", "回答3", "问题4", "回答4"], "应保留最近的原始消息"
+
+    # 清空后摘要和预取结果一并失效
+    store.prefetch(session_id)
+    assert store.clear(session_id) == 10, "应删除全部10条消息"
+    assert store.load(session_id) == [], "清空后历史应为空"
+    assert cache.get(f"session_summary:{session_id}") is None, "清空后摘要缓存应被删除"
+
+    for i in range(5):
+        store.append_turn(session_id, f"新问题{i}", f"新回答{i}")
+    summary = store.load(session_id)[0].content
+    assert "问题0" not in summary.replace("新问题0", ""), "清空前的内容不应再出现在摘要中"
+
+    store.clear(session_id)
+    print("✓ 会话存储测试通过")
+
+
+def test_response_cache():
+    """测试响应缓存的读写和缓存代数"""
+    print("测试响应缓存...")
+
+    from services.response_cache import ResponseCache
+
+    response_cache = ResponseCache()
+    key = response_cache.make_key("explain", f"print('{uuid.uuid4().hex}')")
+    assert response_cache.get(key) is None, "未写入时应未命中"
+
+    response_cache.set(key, {"success": True, "content": "解释", "metadata": {}})
+    cached = response_cache.get(key)
+    assert cached["content"] == "解释" and cached["metadata"]["cache_hit"], "写入后应命中并标记cache_hit"
+
+    # clear() 递增缓存代数，旧条目全部失效
+    generation = response_cache._generation()
+    response_cache.clear()
+    assert response_cache._generation() == generation + 1, "clear()应递增缓存代数"
+    assert response_cache.get(key) is None, "clear()后旧条目应失效"
+
+    # 其他进程调用clear()后，本进程的代数过期时同样失效
+    response_cache.set(key, {"success": True, "content": "解释", "metadata": {}})
+    ResponseCache().clear()
+    response_cache._local_generation = (0.0, response_cache._local_generation[1])
+    assert response_cache.get(key) is None, "其他实例clear()后，代数过期时应重新读取并失效"
+
+    print("✓ 响应缓存测试通过")
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+def test_history_more_api():
+    """测试历史记录增量加载接口的游标分页"""
+    print("测试历史记录增量加载接口...")
+
+    from core.api_views import HISTORY_PAGE_SIZE
+    from core.models import RequestLog
+
+    client = Client()
+    client.get('/')
+    session_id = client.session.session_key
+
+    now = timezone.now()
+    total = HISTORY_PAGE_SIZE + 5
+    RequestLog.objects.bulk_create([
+        RequestLog(session_id=session_id, request_type='explain', input_content=f"输入{i}",
+                   created_at=now - timedelta(seconds=i))
+        for i in range(total)
+    ])
+
+    first = client.get('/api/history/more/').json()
+    assert first['success'] and len(first['history']) == HISTORY_PAGE_SIZE, "第一页应返回一整页记录"
+    assert first['next_cursor'], "还有更多记录时应返回next_cursor"
+
+    second = client.get('/api/history/more/', {'cursor': first['next_cursor']}).json()
+    assert len(second['history']) == total - HISTORY_PAGE_SIZE, "第二页应返回剩余记录"
+    assert second['next_cursor'] is None, "没有更多记录时next_cursor应为空"
+
+    ids = [row['id'] for row in first['history'] + second['history']]
+    assert len(set(ids)) == total, "翻页不应重复或遗漏记录"
+    assert first['history'][0]['input_content'] == "输入0", "记录应按创建时间倒序排列"
+
+    assert client.get('/api/history/more/', {'cursor': 'bad'}).status_code == 400, "格式错误的游标应返回400"
+    assert client.get('/api/history/more/', {'cursor': str(uuid.uuid4())}).status_code == 400, \
+        "不存在的游标应返回400"
+
+    print("✓ 历史记录增量加载接口测试通过")
+
+
+def main():
+    """主测试函数"""
+    print("开始测试会话存储与缓存...")
+    print("=" * 50)
+
+    setup_module()
+    try:
+        test_session_store()
+        test_response_cache()
+        test_history_more_api()
+
+        print("=" * 50)
+        print("✓ 所有测试通过！")
+        return True
+
+    except Exception as e:
+        print("=" * 50)
+        print(f"✗ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)